@@ -8,11 +8,12 @@ from random import Random
 class Attacker:
 
     # noinspection PyPep8Naming
-    def __init__(self, K, L):
+    def __init__(self, K, L, rand=None):
         self.task_label = {}  # randomized label on each task
         self.task_count = {}  # observation times of each task
         self.K = K  # number of workers for each task
         self.L = L  # label size
+        self.rand = rand if rand is not None else Random()  # random stream of the attacker
 
     def set_task_label(self, task, label):
         """ set a randomized label on a task """
@@ -23,27 +24,37 @@ class Attacker:
         return self.task_label[task]
 
     def observe(self, task):
-        """ update the observation times of a task """
-        if task in self.task_count.keys():
-            count = self.task_count[task]
-            count += 1
-            self.task_count[task] = count
-            # label the task honestly if the task is observed for more than K times
-            if count == self.K + 1:
-                rand = Random()
-                if rand.random() <= 0.8:
-                    self.set_task_label(task, task.get_true_label())
-                else:
-                    label = rand.randint(0, self.L - 1)
-                    while label == task.get_true_label():
-                        label = rand.randint(0, self.L - 1)
-                    self.set_task_label(task, label)
+        """ update the observation times of a task and return them """
+        count = self.task_count.get(task, 0) + 1
+        self.task_count[task] = count
+        # label the task honestly if the task is observed for more than K times
+        if count == self.K + 1:
+            self._identify(task)
+        return count
+
+    def add_count(self, task, count):
+        """ add observations of a task made elsewhere and return the observation times """
+        previous = self.task_count.get(task, 0)
+        self.task_count[task] = previous + count
+        if previous <= self.K < previous + count:
+            self._identify(task)
+        return previous + count
+
+    def set_count(self, task, count):
+        """ set the observation times of a task """
+        self.task_count[task] = count
+
+    def _identify(self, task):
+        """ label an identified golden task honestly """
+        rand = self.rand
+        if rand.random() <= 0.8:
+            self.set_task_label(task, task.get_true_label())
         else:
-            self.task_count[task] = 1
+            label = rand.randint(0, self.L - 1)
+            while label == task.get_true_label():
+                label = rand.randint(0, self.L - 1)
+            self.set_task_label(task, label)
 
     def get_count(self, task):
         """ return the observation times of a task """
-        if task in self.task_count.keys():
-            return self.task_count[task]
-        else:
-            return 0
+        return self.task_count.get(task, 0)
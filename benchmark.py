@@ -0,0 +1,229 @@
+"""
+#Benchmark of TDADP scaling over grids of N, M, K, L, mu, lambda and shard counts on synthetic datasets.
+#For each point of the grid, a SYN dataset is generated through Preprocess in a temporary directory and TDADP runs on it
+#in a freshly forked process, so that the peak memory of each point is measured on its own. The throughput, the time in
+#truth inference and task assignment, the setup and I/O phases and the peak memory are saved in a JSON file, which can
+#be compared between commits. Sharded points also record their accuracy against the single-process point, and whether
+#their results are reproduced by a second run and by the shards running in the coordinator process.
+"""
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy as np
+
+from preprocess import Preprocess
+from tdadp import Tdadp
+
+# grid and fixed parameters, overridden by "--name=value" options
+DEFAULTS = {
+    'N': '1000', 'M': '100', 'K': '5', 'L': '4', 'mu': '0.2', 'lambd': '2', 'shards': '1',
+    'theta': 0.7, 'epsilon': 0.1, 'B': 10, 'alpha': 0.5, 'tau': 0.1, 'delta': 0.5, 'runs': 1, 'seed': 0,
+    'sync_interval': 1000,
+}
+GRID = ('N', 'M', 'K', 'L', 'mu', 'lambd', 'shards')
+
+
+def _peak_memory(who=resource.RUSAGE_SELF):
+    """ return the peak resident memory of the process (or of its largest child) in MB """
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+# noinspection PyPep8Naming
+def _benchmark_point(point, params):
+    """ generate a dataset for a point of the grid, run TDADP on it and return the measurements """
+    N, M, K, L, mu, lambd, shards = point
+    dataset = tempfile.mkdtemp(prefix='tdadp-benchmark-')
+    try:
+        start = time.perf_counter()
+        pre = Preprocess.synth_dataset(dataset, params['runs'], mu, params['epsilon'], lambd, N, M, L, K,
+                                       params['theta'], params['seed'])
+        pre.simulate()
+        generate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pre.formalize(params['binary'])
+        formalize_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tdssa = Tdadp(params['B'], params['alpha'], params['tau'], params['delta'], seed=params['seed'], profile=True,
+                      shards=shards, sync_interval=params['sync_interval'])
+        tdssa.read_normal(dataset)
+        setup_time = time.perf_counter() - start
+
+        runs = []
+        for r in range(0, params['runs']):
+            start = time.perf_counter()
+            tdssa.read_golden(dataset)
+            tdssa.read_attack(dataset, r)
+            tdssa.read_order(dataset, r)
+            read_time = time.perf_counter() - start
+            requests = len(tdssa.order)
+
+            start = time.perf_counter()
+            tdssa.run()
+            run_time = time.perf_counter() - start
+            profile = tdssa.get_profile()
+            # the truth inference time is spent in batches and in the final pass
+            etd_time = profile['batch_time'] + profile['final_time']
+            runs.append({
+                'requests': requests,
+                'requests_per_second': requests / run_time if run_time > 0 else None,
+                'run_seconds': run_time,
+                'read_seconds': read_time,
+                'etd_seconds': etd_time,
+                'etd_seconds_per_call': etd_time / profile['etd_calls'] if profile['etd_calls'] else None,
+                'assign_seconds': profile['assign_time'],
+                'a_accuracy': tdssa.get_a_accuracy(),
+                'e_number': tdssa.get_e_number(),
+                't_cost': tdssa.get_t_cost(),
+                'profile': profile,
+            })
+
+        return {
+            'N': N, 'M': M, 'K': K, 'L': L, 'mu': mu, 'lambd': lambd, 'shards': shards,
+            'generate_seconds': generate_time,
+            'formalize_seconds': formalize_time,
+            'setup_seconds': setup_time,
+            'peak_memory_mb': _peak_memory(),
+            'shard_peak_memory_mb': _peak_memory(resource.RUSAGE_CHILDREN) if shards > 1 else None,
+            'shard_reproducible': _shard_reproducible(dataset, params, shards, runs) if shards > 1 else None,
+            'runs': runs,
+        }
+    finally:
+        shutil.rmtree(dataset, ignore_errors=True)
+
+
+def _shard_results(dataset, params, shards):
+    """ return the A-Accuracy, E-Number and T-Cost of each run of a sharded point """
+    tdssa = Tdadp(params['B'], params['alpha'], params['tau'], params['delta'], seed=params['seed'], shards=shards,
+                  sync_interval=params['sync_interval'])
+    tdssa.read_normal(dataset)
+    results = []
+    for r in range(0, params['runs']):
+        tdssa.read_golden(dataset)
+        tdssa.read_attack(dataset, r)
+        tdssa.read_order(dataset, r)
+        tdssa.run()
+        results.append([tdssa.get_a_accuracy(), tdssa.get_e_number(), tdssa.get_t_cost()])
+    return results
+
+
+def _shard_reproducible(dataset, params, shards, runs):
+    """
+    check that the runs of a sharded point give the same results again and when the shards run one after another in the
+    coordinator process
+    """
+    results = [[run['a_accuracy'], run['e_number'], run['t_cost']] for run in runs]
+    if _shard_results(dataset, params, shards) != results:
+        return False
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return True
+    # a pool process is daemonic, so it cannot fork the shards
+    with multiprocessing.get_context('fork').Pool(1) as pool:
+        return pool.apply(_shard_results, (dataset, params, shards)) == results
+
+
+def _benchmark_child(point, params, conn):
+    conn.send(_benchmark_point(point, params))
+    conn.close()
+
+
+def _commit():
+    """ return the commit of the working tree, if any """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def benchmark(output, params):
+    """ benchmark every point of the grid and save the measurements in the output file """
+    grids = [[cast(value) for value in str(params[name]).split(',') if value]
+             for name, cast in zip(GRID, (int, int, int, int, float, int, int))]
+    points = list(itertools.product(*grids))
+    results = []
+    for point in points:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # a fresh process for each point keeps the peak memory of the points apart; it is not a pool process, so
+            # that it can fork the shards
+            context = multiprocessing.get_context('fork')
+            conn, child_conn = context.Pipe(False)
+            process = context.Process(target=_benchmark_child, args=(point, params, child_conn))
+            process.start()
+            child_conn.close()
+            try:
+                result = conn.recv()
+            except EOFError:
+                raise RuntimeError(f'benchmark of {point} failed')
+            finally:
+                process.join()
+        else:
+            result = _benchmark_point(point, params)
+        print(json.dumps(result))
+        results.append(result)
+
+    # accuracy of the sharded points against the single-process point with the same parameters
+    baselines = {}
+    for result in results:
+        if result['shards'] <= 1:
+            baselines[tuple(result[name] for name in GRID[:-1])] = result
+    for result in results:
+        baseline = baselines.get(tuple(result[name] for name in GRID[:-1]))
+        if result['shards'] > 1 and baseline is not None:
+            result['baseline_a_accuracy'] = [run['a_accuracy'] for run in baseline['runs']]
+            result['baseline_requests_per_second'] = [run['requests_per_second'] for run in baseline['runs']]
+
+    with open(output, 'w') as file:
+        json.dump({
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'params': {name: params[name] for name in params if name not in GRID},
+            'results': results,
+        }, file, indent=2)
+
+
+def main(args):
+    # "--name=value" sets a comma separated grid of N, M, K, L, mu, lambd or shards, or a fixed parameter (theta,
+    # epsilon, B, alpha, tau, delta, runs, seed, sync_interval), and "--binary" benchmarks the binary dataset format
+    params = dict(DEFAULTS)
+    params['binary'] = False
+    options = [arg for arg in args if arg.startswith('--')]
+    args = [arg for arg in args if arg not in options]
+    if len(args) != 1:
+        print("Usage: benchmark.py output.json [--N=1000,2000] [--M=100] [--K=5] [--L=4] [--mu=0.2] [--lambd=2] "
+              "[--shards=1,2,4] [--sync_interval=1000] [--runs=1] [--seed=0] [--binary]")
+        sys.exit(0)
+
+    try:
+        for option in options:
+            if option == '--binary':
+                params['binary'] = True
+                continue
+            name, value = option[2:].split('=')
+            if name not in params:
+                raise ValueError(f'unknown option {option}')
+            params[name] = value if name in GRID else type(DEFAULTS[name])(value)
+        benchmark(args[0], params)
+    except Exception as e:
+        print(e)
+        traceback.print_stack()
+        traceback.print_exc()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
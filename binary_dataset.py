@@ -0,0 +1,161 @@
+"""
+#Compact binary format of the files written by Preprocess and read by Tdadp.
+#"input.npz" and "golden.npz" hold the (task, worker, label) triples as columnar arrays, where the labels of the i-th
+#row (task or worker) are the entries between offsets[i] and offsets[i + 1]. For each run, "attack.npz" holds the
+#randomized labels and the malicious workers of each attacker and "order.npy" holds the worker ID of each request.
+#Running this module converts the text files of a dataset into the binary format.
+"""
+import os
+import sys
+import traceback
+
+import numpy as np
+
+
+def label_dtype(L):
+    """ return the smallest integer type that holds labels of the label size """
+    return np.int8 if L <= 128 else np.int32
+
+
+def _path(dataset, *names):
+    return os.sep.join([dataset, *[str(name) for name in names]])
+
+
+def prefer_binary(text_path, binary_path):
+    """ check whether the binary file exists and is not older than the text file """
+    if not os.path.exists(binary_path):
+        return False
+    return not os.path.exists(text_path) or os.path.getmtime(binary_path) >= os.path.getmtime(text_path)
+
+
+# noinspection PyPep8Naming
+def save_normal(dataset, M, N, L, K, task_ids, true_labels, offsets, worker_ids, labels):
+    """ save the worker labels on normal tasks """
+    np.savez(_path(dataset, 'input.npz'), shape=np.array([M, N, L, K], dtype=np.int64),
+             task_ids=np.asarray(task_ids, dtype=np.int64), true_labels=np.asarray(true_labels, dtype=label_dtype(L)),
+             offsets=np.asarray(offsets, dtype=np.int64), worker_ids=np.asarray(worker_ids, dtype=np.int32),
+             labels=np.asarray(labels, dtype=label_dtype(L)))
+
+
+def load_normal(dataset):
+    """ load the worker labels on normal tasks """
+    with np.load(_path(dataset, 'input.npz')) as data:
+        return {key: data[key] for key in data.files}
+
+
+# noinspection PyPep8Naming
+def save_golden(dataset, L, golden_ids, golden_labels, worker_ids, offsets, task_ids, labels):
+    """ save the true labels of golden tasks and the worker labels on golden tasks """
+    np.savez(_path(dataset, 'golden.npz'), golden_ids=np.asarray(golden_ids, dtype=np.int64),
+             golden_labels=np.asarray(golden_labels, dtype=label_dtype(L)),
+             worker_ids=np.asarray(worker_ids, dtype=np.int32), offsets=np.asarray(offsets, dtype=np.int64),
+             task_ids=np.asarray(task_ids, dtype=np.int64), labels=np.asarray(labels, dtype=label_dtype(L)))
+
+
+def load_golden(dataset):
+    """ load the true labels of golden tasks and the worker labels on golden tasks """
+    with np.load(_path(dataset, 'golden.npz')) as data:
+        return {key: data[key] for key in data.files}
+
+
+# noinspection PyPep8Naming
+def save_attack(dataset, r, L, mu, epsilon, task_ids, labels, offsets, worker_ids):
+    """ save the randomized labels on the task_ids (one row per attacker) and the malicious workers of each attacker for
+    the rth run """
+    np.savez(_path(dataset, r, 'attack.npz'), params=np.array([mu, epsilon], dtype=np.float64),
+             task_ids=np.asarray(task_ids, dtype=np.int64), labels=np.asarray(labels, dtype=label_dtype(L)),
+             offsets=np.asarray(offsets, dtype=np.int64), worker_ids=np.asarray(worker_ids, dtype=np.int32))
+
+
+def load_attack(dataset, r):
+    """ load the randomized labels and the malicious workers of each attacker for the rth run """
+    with np.load(_path(dataset, r, 'attack.npz')) as data:
+        return {key: data[key] for key in data.files}
+
+
+def save_order(dataset, r, order):
+    """ save the requesting order of workers for the rth run """
+    np.save(_path(dataset, r, 'order.npy'), np.asarray(order, dtype=np.int32))
+
+
+def load_order(dataset, r):
+    """ memory-map the requesting order of workers for the rth run """
+    return np.load(_path(dataset, r, 'order.npy'), mmap_mode='r')
+
+
+def stream_order(order, chunk_size=65536):
+    """ yield the worker IDs of a requesting order, converting one chunk of the array at a time """
+    for start in range(0, len(order), chunk_size):
+        yield from order[start:start + chunk_size].tolist()
+
+
+def _read_rows(line):
+    return line.rstrip('\n').rstrip('\t').split('\t')
+
+
+def convert(dataset):
+    """ convert the text files of a dataset and of each of its runs into the binary format """
+    with open(_path(dataset, 'input.txt')) as file:
+        elements = _read_rows(file.readline())
+        M, N, L, K = int(elements[0]), int(elements[1]), int(elements[2]), int(elements[3])
+        task_ids, true_labels, offsets, worker_ids, labels = [], [], [0], [], []
+        line = file.readline()
+        while line:
+            elements = _read_rows(line)
+            task_ids.append(int(elements[0]))
+            true_labels.append(int(elements[1]))
+            for i in range(0, int(elements[2])):
+                worker_ids.append(int(elements[2 * i + 3]))
+                labels.append(int(elements[2 * i + 4]))
+            offsets.append(len(worker_ids))
+            line = file.readline()
+    save_normal(dataset, M, N, L, K, task_ids, true_labels, offsets, worker_ids, labels)
+
+    with open(_path(dataset, 'golden.txt')) as file:
+        golden_num = int(file.readline())
+        elements = _read_rows(file.readline())
+        golden_ids = [int(elements[i * 2]) for i in range(0, golden_num)]
+        golden_labels = [int(elements[i * 2 + 1]) for i in range(0, golden_num)]
+        worker_ids, offsets, task_ids, labels = [], [0], [], []
+        line = file.readline()
+        while line:
+            elements = _read_rows(line)
+            worker_ids.append(int(elements[0]))
+            for j in range(0, (len(elements) - 1) // 2):
+                task_ids.append(int(elements[j * 2 + 1]))
+                labels.append(int(elements[j * 2 + 2]))
+            offsets.append(len(task_ids))
+            line = file.readline()
+    save_golden(dataset, L, golden_ids, golden_labels, worker_ids, offsets, task_ids, labels)
+
+    r = 0
+    while os.path.exists(_path(dataset, r, 'attack.txt')):
+        with open(_path(dataset, r, 'attack.txt')) as file:
+            elements = _read_rows(file.readline())
+            mu, epsilon, lambd = float(elements[0]), float(elements[1]), int(elements[2])
+            task_ids, labels, offsets, worker_ids = [], [], [0], []
+            for i in range(0, lambd):
+                elements = _read_rows(file.readline())
+                task_num = int(elements[1])
+                task_ids = [int(elements[2 * j + 2]) for j in range(0, task_num)]
+                labels.append([int(elements[2 * j + 3]) for j in range(0, task_num)])
+                elements = _read_rows(file.readline())
+                worker_ids.extend(int(elements[j + 2]) for j in range(0, int(elements[1])))
+                offsets.append(len(worker_ids))
+        save_attack(dataset, r, L, mu, epsilon, task_ids, np.array(labels).reshape(lambd, len(task_ids)), offsets,
+                    worker_ids)
+        with open(_path(dataset, r, 'order.txt')) as file:
+            save_order(dataset, r, [int(line) for line in file if line.strip()])
+        r += 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: binary_dataset.py dataset")
+        sys.exit(0)
+    try:
+        convert(sys.argv[1])
+    except Exception as e:
+        print(e)
+        traceback.print_stack()
+        traceback.print_exc()
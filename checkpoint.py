@@ -0,0 +1,242 @@
+"""
+#Snapshots of a Tdadp run in progress, so that a long run can resume after a crash or preemption with identical results.
+#A snapshot holds the position in the requesting order and the whole mid-run state: the storage arrays of the scores,
+#flags, counters and aggregated labels, the current labels and assigned workers, the golden task registry, the state of
+#the engine and of its truth inference, the attacker observations, the exposure tracking and the random streams. It is
+#written to a compressed npz file without pickled objects, and replaced atomically. Once the run finishes, the snapshot
+#only keeps its results, so that a repeated run is not executed again.
+#Every snapshot carries a fingerprint of the snapshot version, the parameters and the requesting order of the run, and a
+#snapshot of another run or version is ignored.
+"""
+import hashlib
+import json
+import os
+from random import Random
+
+import numpy as np
+
+from core import STATE
+from service import PROFILE_STATS
+
+# version of the snapshot files, to be increased whenever save writes different arrays
+VERSION = 1
+
+
+def path(directory, r):
+    """ return the snapshot path of the rth run """
+    return os.sep.join([directory, str(r), 'checkpoint.npz'])
+
+
+def fingerprint(tdadp):
+    """ return the fingerprint of the snapshot version, the parameters and the requesting order of the current run """
+    params = {
+        'version': VERSION,
+        'B': tdadp.B, 'alpha': tdadp.alpha, 'tau': tdadp.tau, 'delta': tdadp.delta, 'vectorized': tdadp.vectorized,
+        'incremental': tdadp.incremental, 'seed': tdadp.seed, 'convergence': sorted(tdadp.convergence.items()),
+        'r': tdadp.r, 'L': tdadp.L, 'K': tdadp.K, 'epsilon': tdadp.epsilon, 'lambd': tdadp.lambd,
+        'workers': len(tdadp.id_to_worker), 'tasks': len(tdadp.core.tasks), 'attackers': len(tdadp.id_to_attacker),
+    }
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(tdadp.order, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+
+def load(file_path, tdadp):
+    """ return the snapshot of the current run saved in the file, or None if there is none """
+    if not os.path.exists(file_path):
+        return None
+    with np.load(file_path) as data:
+        if str(data['fingerprint']) != fingerprint(tdadp):
+            return None
+        return dict(data)
+
+
+def remove(file_path):
+    """ remove a snapshot """
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def _random_state(rand):
+    """ return the state of a random stream as an array """
+    internal = rand.getstate()[1]
+    return np.array(internal, dtype=np.uint32)
+
+
+def _set_random_state(rand, state):
+    rand.setstate((Random.VERSION, tuple(int(value) for value in state), None))
+
+
+def _rows(rows, dtype=np.int32):
+    """ flatten the rows into the offsets and the values of a CSR layout """
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    values = np.fromiter((value for row in rows for value in row), dtype=dtype, count=int(offsets[-1]))
+    return offsets, values
+
+
+def _write(file_path, arrays):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    temp_path = file_path + '.tmp.npz'
+    np.savez_compressed(temp_path, **arrays)
+    os.replace(temp_path, file_path)
+
+
+def save(file_path, tdadp, engine, rand, elapsed):
+    """ save the state of a run in progress after tdadp.requests requests """
+    core = tdadp.core
+    workers = core.workers
+    tasks = core.tasks
+    arrays = {name: np.frombuffer(getattr(core, name), dtype=np.uint8 if name in ('banned', 'golden') else
+                                  getattr(core, name).typecode) for name in STATE}
+    arrays['fingerprint'] = np.array(fingerprint(tdadp))
+    arrays['finished'] = np.array(False)
+    arrays['elapsed'] = np.array(elapsed, dtype=np.float64)
+    arrays['requests'] = np.array(tdadp.requests, dtype=np.int64)
+
+    # current labels and assigned workers, in their order
+    arrays['labeled_offsets'], arrays['labeled_tasks'] = _rows(
+        [[task.index for task in worker.get_labeled_pairs()] for worker in workers])
+    arrays['labeled_labels'] = np.fromiter((label for worker in workers for label in worker.get_labeled_pairs().values()),
+                                           dtype=np.int32, count=int(arrays['labeled_offsets'][-1]))
+    arrays['assigned_offsets'], arrays['assigned_workers'] = _rows(
+        [[worker.index for worker in task.get_assigned()] for task in tasks])
+
+    # golden task registry
+    arrays['golden_tasks'] = np.array([task.index for task in tdadp.golden_tasks], dtype=np.int32)
+    arrays['open_tasks'] = np.array([task.index for task in tdadp.open_tasks], dtype=np.int32)
+    arrays['id_to_golden'] = np.array([task.index for task in tdadp.id_to_golden.values()], dtype=np.int32)
+
+    # engine and truth inference
+    etd = engine.etd
+    arrays['workers'] = np.array([worker.index for worker in engine.workers], dtype=np.int32)
+    arrays['promotion_num'] = np.array(engine.promotion_num, dtype=np.int64)
+    arrays['gold_num'] = np.array(engine.gold_num, dtype=np.int64)
+    arrays['stats'] = np.array([engine.stats[name] for name in PROFILE_STATS], dtype=np.float64)
+    arrays['assign_random'] = _random_state(engine.pta.rand)
+    arrays['deviate_random'] = _random_state(rand)
+    arrays['etd_warm'] = np.array(etd.warm)
+    arrays['etd_weighted'] = np.array([worker.index for worker in etd.weighted], dtype=np.int32)
+    arrays['etd_dirty_tasks'] = np.array([task.index for task in etd.dirty_tasks], dtype=np.int32)
+    arrays['etd_dirty_workers'] = np.array([worker.index for worker in etd.dirty_workers], dtype=np.int32)
+
+    # attackers, in the order of their IDs
+    attackers = list(tdadp.id_to_attacker.values())
+    arrays['attacker_count_offsets'], arrays['attacker_count_tasks'] = _rows(
+        [[task.index for task in attacker.task_count] for attacker in attackers])
+    arrays['attacker_counts'] = np.fromiter((count for attacker in attackers for count in attacker.task_count.values()),
+                                            dtype=np.int32, count=int(arrays['attacker_count_offsets'][-1]))
+    arrays['attacker_label_offsets'], arrays['attacker_label_tasks'] = _rows(
+        [[task.index for task in attacker.task_label] for attacker in attackers])
+    arrays['attacker_labels'] = np.fromiter((label for attacker in attackers for label in attacker.task_label.values()),
+                                            dtype=np.int32, count=int(arrays['attacker_label_offsets'][-1]))
+    arrays['attacker_random'] = np.array([_random_state(attacker.rand) for attacker in attackers],
+                                         dtype=np.uint32).reshape(len(attackers), -1)
+
+    # exposure tracking
+    arrays['identified_offsets'], arrays['identified_attackers'] = _rows(list(tdadp.identified.values()))
+    arrays['identified_tasks'] = np.array([task.index for task in tdadp.identified], dtype=np.int32)
+    arrays['exposed_tasks'] = np.array([task.index for task in tdadp.exposed], dtype=np.int32)
+    arrays['attacker_exposed'] = np.array([tdadp.attacker_exposed[attacker_id] for attacker_id in tdadp.id_to_attacker],
+                                          dtype=np.int64)
+    arrays['exposure'] = np.array(tdadp.exposure, dtype=np.int64).reshape(-1, 2)
+    _write(file_path, arrays)
+
+
+def restore(snapshot, tdadp, engine, rand):
+    """ restore the state of a run in progress saved in a snapshot, and return the running time (ms) so far """
+    core = tdadp.core
+    workers = core.workers
+    tasks = core.tasks
+    for name in STATE:
+        values = getattr(core, name)
+        values[:] = type(values)(values.typecode, snapshot[name].tobytes()) if name not in ('banned', 'golden') \
+            else bytearray(snapshot[name].tobytes())
+    tdadp.requests = int(snapshot['requests'])
+
+    offsets = snapshot['labeled_offsets'].tolist()
+    labeled_tasks = snapshot['labeled_tasks'].tolist()
+    labeled_labels = snapshot['labeled_labels'].tolist()
+    for worker in workers:
+        i = worker.index
+        worker.labeled_pairs = {tasks[labeled_tasks[j]]: labeled_labels[j] for j in range(offsets[i], offsets[i + 1])}
+    offsets = snapshot['assigned_offsets'].tolist()
+    assigned_workers = snapshot['assigned_workers'].tolist()
+    for task in tasks:
+        i = task.index
+        task.assigned = [workers[assigned_workers[j]] for j in range(offsets[i], offsets[i + 1])]
+
+    tdadp.golden_tasks = dict.fromkeys(tasks[i] for i in snapshot['golden_tasks'].tolist())
+    tdadp.open_tasks = dict.fromkeys(tasks[i] for i in snapshot['open_tasks'].tolist())
+    tdadp.id_to_golden = {}
+    for i in snapshot['id_to_golden'].tolist():
+        tdadp.id_to_golden[tasks[i].get_task_id()] = tasks[i]
+
+    etd = engine.etd
+    engine.workers = {workers[i] for i in snapshot['workers'].tolist()}
+    engine.promotion_num = int(snapshot['promotion_num'])
+    engine.gold_num = int(snapshot['gold_num'])
+    engine.stats.update(zip(PROFILE_STATS, snapshot['stats'].tolist()))
+    for name in PROFILE_STATS:
+        if not name.endswith('_time'):
+            engine.stats[name] = int(engine.stats[name])
+    engine.pta.set_golden_tasks(tdadp.golden_tasks)
+    _set_random_state(engine.pta.rand, snapshot['assign_random'])
+    _set_random_state(rand, snapshot['deviate_random'])
+    etd.warm = bool(snapshot['etd_warm'])
+    etd.weighted = {workers[i] for i in snapshot['etd_weighted'].tolist()}
+    etd.dirty_tasks = {tasks[i] for i in snapshot['etd_dirty_tasks'].tolist()}
+    etd.dirty_workers = {workers[i] for i in snapshot['etd_dirty_workers'].tolist()}
+
+    offsets = snapshot['attacker_count_offsets'].tolist()
+    count_tasks = snapshot['attacker_count_tasks'].tolist()
+    counts = snapshot['attacker_counts'].tolist()
+    label_offsets = snapshot['attacker_label_offsets'].tolist()
+    label_tasks = snapshot['attacker_label_tasks'].tolist()
+    labels = snapshot['attacker_labels'].tolist()
+    for a, attacker in enumerate(tdadp.id_to_attacker.values()):
+        attacker.task_count = {tasks[count_tasks[j]]: counts[j] for j in range(offsets[a], offsets[a + 1])}
+        attacker.task_label = {tasks[label_tasks[j]]: labels[j] for j in range(label_offsets[a], label_offsets[a + 1])}
+        _set_random_state(attacker.rand, snapshot['attacker_random'][a])
+
+    offsets = snapshot['identified_offsets'].tolist()
+    attacker_ids = snapshot['identified_attackers'].tolist()
+    tdadp.identified = {tasks[task_index]: attacker_ids[offsets[j]:offsets[j + 1]]
+                        for j, task_index in enumerate(snapshot['identified_tasks'].tolist())}
+    tdadp.exposed = dict.fromkeys(tasks[i] for i in snapshot['exposed_tasks'].tolist())
+    tdadp.attacker_exposed = dict(zip(tdadp.id_to_attacker, snapshot['attacker_exposed'].tolist()))
+    tdadp.exposure = [tuple(point) for point in snapshot['exposure'].tolist()]
+    tdadp.e_number = len(tdadp.exposed)
+    return float(snapshot['elapsed'])
+
+
+def save_results(file_path, tdadp):
+    """ replace the snapshot of a finished run with its results """
+    profile = tdadp.profile_stats
+    _write(file_path, {
+        'fingerprint': np.array(fingerprint(tdadp)),
+        'finished': np.array(True),
+        'a_accuracy': np.array(tdadp.a_accuracy, dtype=np.float64),
+        'e_number': np.array(tdadp.e_number, dtype=np.int64),
+        't_cost': np.array(tdadp.t_cost, dtype=np.float64),
+        'running_time': np.array(tdadp.running_time, dtype=np.float64),
+        'profile': np.array([profile[name] for name in PROFILE_STATS] if profile else [], dtype=np.float64),
+        'exposure': np.array(tdadp.exposure, dtype=np.int64).reshape(-1, 2),
+        'attacker_exposed': np.array([tdadp.attacker_exposed[attacker_id] for attacker_id in tdadp.id_to_attacker],
+                                     dtype=np.int64),
+    })
+
+
+def restore_results(snapshot, tdadp):
+    """ restore the results of a finished run saved in a snapshot """
+    tdadp.a_accuracy = float(snapshot['a_accuracy'])
+    tdadp.e_number = int(snapshot['e_number'])
+    tdadp.t_cost = float(snapshot['t_cost'])
+    tdadp.running_time = float(snapshot['running_time'])
+    profile = snapshot['profile'].tolist()
+    tdadp.profile_stats = {}
+    if profile:
+        tdadp.profile_stats = {name: value if name.endswith('_time') else int(value)
+                               for name, value in zip(PROFILE_STATS, profile)}
+    tdadp.exposure = [tuple(point) for point in snapshot['exposure'].tolist()]
+    tdadp.attacker_exposed = dict(zip(tdadp.id_to_attacker, snapshot['attacker_exposed'].tolist()))
@@ -0,0 +1,193 @@
+#Provides the compact storage of workers and tasks. The scores, weights, flags and counters of workers and tasks are kept
+#in parallel typed arrays indexed by the worker or task index, and the (task, worker, label) triples of the original
+#dataset are compressed into CSR rows with the smallest labels holding the label size. Worker and Task objects are
+#thin views over a Core.
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# storage arrays that change during a run, as opposed to the dataset and the attacker IDs read before it
+STATE = ('s', 'r', 'p', 'weight', 'banned', 's_count', 'r_count', 'r_correct', 'aggregated', 'c_i', 'exposed',
+         'unreliable', 'golden', 'votes')
+
+
+def _to_array(typecode, values):
+    """ convert a NumPy array into a typed array with fast scalar access """
+    result = array(typecode)
+    result.frombytes(np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+    return result
+
+
+def label_typecode(L):
+    """ return the typecode of the smallest typed array that holds labels of the label size """
+    if L <= 1 << 7:
+        return 'b'
+    return 'h' if L <= 1 << 15 else 'i'
+
+
+class Core:
+
+    def __init__(self):
+        self.L = 0  # label size
+
+        # worker state, indexed by worker index
+        self.workers = []  # Worker views
+        self.s = array('d')  # trust scores
+        self.r = array('d')  # reliability scores
+        self.p = array('d')  # accuracies on golden tasks
+        self.weight = array('d')  # weights in truth inference
+        self.banned = bytearray()  # banned flags
+        self.attacker_id = array('i')  # attacker IDs (-1 for independent workers)
+        self.s_count = array('i')  # golden tasks on which the worker votes for a wrong majority label
+        self.r_count = array('i')  # golden tasks labeled by the worker
+        self.r_correct = array('i')  # golden tasks correctly labeled by the worker
+
+        # task state, indexed by task index
+        self.tasks = []  # Task views
+        self.task_id = array('q')  # task IDs
+        self.true_label = array('i')  # true labels
+        self.aggregated = array('i')  # aggregated labels
+        self.c_i = array('d')  # average reliability scores of assigned workers
+        self.exposed = array('i')  # number of times assigned to banned workers
+        self.unreliable = array('i')  # number of assigned workers whose reliability score is below delta
+        self.golden = bytearray()  # golden flags
+        self.votes = array('i')  # number of assigned workers voting for each label, L entries per task
+
+        # (worker, task, label) triples and (task, worker) memberships of the original dataset, compressed into CSR rows
+        # when they are first looked up
+        self.pair_worker = array('i')
+        self.pair_task = array('i')
+        self.pair_label = array('b')  # typecode fixed by the label size of the first task
+        self.member_task = array('i')
+        self.member_worker = array('i')
+        self.worker_rows = None  # (offsets, task indexes, labels) of each worker
+        self.task_rows = None  # (offsets, worker indexes) of each task
+
+    def add_worker(self, worker):
+        """ allocate the state of a worker and return its index """
+        self.workers.append(worker)
+        for scores in (self.s, self.r, self.p, self.weight):
+            scores.append(0)
+        self.banned.append(0)
+        self.attacker_id.append(-1)
+        for counts in (self.s_count, self.r_count, self.r_correct):
+            counts.append(0)
+        return len(self.workers) - 1
+
+    # noinspection PyPep8Naming
+    def add_task(self, task, task_id, true_label, L):
+        """ allocate the state of a task and return its index, all tasks sharing the label size of the first one """
+        if not self.tasks:
+            self.L = L
+            self.pair_label = array(label_typecode(L), self.pair_label)
+        elif L != self.L:
+            raise ValueError(f'task {task_id} has label size {L} instead of {self.L}')
+        self.tasks.append(task)
+        self.task_id.append(task_id)
+        self.true_label.append(true_label)
+        self.aggregated.append(-1)
+        self.c_i.append(0)
+        self.exposed.append(0)
+        self.unreliable.append(0)
+        self.golden.append(0)
+        self.votes.extend([0] * L)
+        return len(self.tasks) - 1
+
+    def add_pair(self, worker_index, task_index, label):
+        """ record a (task, label) pair of a worker in the original dataset """
+        self.pair_worker.append(worker_index)
+        self.pair_task.append(task_index)
+        self.pair_label.append(label)
+        self.worker_rows = None
+
+    def add_member(self, task_index, worker_index):
+        """ record a worker assigned to a task in the original dataset """
+        self.member_task.append(task_index)
+        self.member_worker.append(worker_index)
+        self.task_rows = None
+
+    def _worker_rows(self):
+        if self.worker_rows is None or len(self.worker_rows[0]) <= len(self.workers):
+            rows = np.frombuffer(self.pair_worker, dtype=np.int32)
+            cols = np.frombuffer(self.pair_task, dtype=np.int32)
+            # sort each row by task index for binary search
+            order = np.lexsort((cols, rows))
+            offsets = np.zeros(len(self.workers) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=len(self.workers)), out=offsets[1:])
+            self.worker_rows = (_to_array('q', offsets), _to_array('i', cols[order]),
+                                _to_array(self.pair_label.typecode,
+                                          np.frombuffer(self.pair_label, dtype=self.pair_label.typecode)[order]))
+        return self.worker_rows
+
+    def _task_rows(self):
+        if self.task_rows is None or len(self.task_rows[0]) <= len(self.tasks):
+            rows = np.frombuffer(self.member_task, dtype=np.int32)
+            # keep the original order of the workers of each task
+            order = np.argsort(rows, kind='stable')
+            offsets = np.zeros(len(self.tasks) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=len(self.tasks)), out=offsets[1:])
+            self.task_rows = (_to_array('q', offsets),
+                              _to_array('i', np.frombuffer(self.member_worker, dtype=np.int32)[order]))
+        return self.task_rows
+
+    def find_pair(self, worker_index, task_index):
+        """ return the label of a worker on a task in the original dataset, or None """
+        offsets, tasks, labels = self._worker_rows()
+        hi = offsets[worker_index + 1]
+        i = bisect_left(tasks, task_index, offsets[worker_index], hi)
+        if i < hi and tasks[i] == task_index:
+            return labels[i]
+        return None
+
+    def pair_range(self, worker_index):
+        """ return the task indexes and labels of a worker in the original dataset with the bounds of its row """
+        offsets, tasks, labels = self._worker_rows()
+        return tasks, labels, offsets[worker_index], offsets[worker_index + 1]
+
+    def members(self, task_index):
+        """ return the workers assigned to a task in the original dataset """
+        offsets, workers = self._task_rows()
+        return [self.workers[workers[i]] for i in range(offsets[task_index], offsets[task_index + 1])]
+
+
+class Pairs(Mapping):
+    """ read-only (task, label) mapping of a worker in the original dataset """
+
+    __slots__ = ('core', 'index')
+
+    def __init__(self, core, index):
+        self.core = core
+        self.index = index
+
+    def __getitem__(self, task):
+        label = self.core.find_pair(self.index, task.index)
+        if label is None:
+            raise KeyError(task)
+        return label
+
+    def __contains__(self, task):
+        return self.core.find_pair(self.index, task.index) is not None
+
+    def keys(self):
+        return self
+
+    def get(self, task, default=None):
+        label = self.core.find_pair(self.index, task.index)
+        return default if label is None else label
+
+    def __iter__(self):
+        tasks, _, lo, hi = self.core.pair_range(self.index)
+        for i in range(lo, hi):
+            yield self.core.tasks[tasks[i]]
+
+    def __len__(self):
+        _, _, lo, hi = self.core.pair_range(self.index)
+        return hi - lo
+
+
+# workers and tasks created without a core share this one
+default_core = Core()
@@ -0,0 +1,131 @@
+"""
+#Content-addressed cache of preprocessed datasets. The files written by Preprocess for a dataset are kept in an entry of
+#the "cache" directory of the dataset, named after a key derived from the preprocessing parameters, the seed, the output
+#format and the hashes of the source CSV files of a real dataset. An entry whose key matches is reused as it is, and the
+#least recently used entries beyond a given number are evicted.
+#Without a seed every preprocessing draws fresh random streams, so nothing is cached.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# version of the preprocessed files, to be increased whenever Preprocess writes different files for the same key
+VERSION = 1
+
+# source files of a real dataset
+SOURCES = ('answer.csv', 'truth.csv', 'quali.csv', 'quali_truth.csv')
+
+
+def _file_hash(file_path, chunk_size=1 << 22):
+    """ return the SHA-256 hash of a file, or None if it does not exist """
+    if not os.path.exists(file_path):
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        chunk = file.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = file.read(chunk_size)
+    return digest.hexdigest()
+
+
+def key(pre, binary=False):
+    """ return the cache key of the files written by a preprocessor, or None if they cannot be reproduced """
+    if pre.seed is None:
+        return None
+    params = {
+        'version': VERSION, 'binary': binary, 'seed': pre.seed, 'run_num': pre.run_num, 'golden_num': pre.golden_num,
+        'mu': pre.mu, 'epsilon': pre.epsilon, 'lamb': pre.lamb, 'N': pre.N, 'M': pre.M, 'L': pre.L, 'K': pre.K,
+        'theta': pre.theta,
+    }
+    # a real dataset is read from its source files, whose parameters are only known once they are read
+    if not pre.N:
+        params['sources'] = {name: _file_hash(os.sep.join([pre.dataset, name])) for name in SOURCES}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _file_names(run_num, binary):
+    """ return the names of the preprocessed files of a dataset and of its runs """
+    names = ['input.npz', 'golden.npz'] if binary else ['input.txt', 'golden.txt']
+    run_names = ['attack.npz', 'order.npy'] if binary else ['attack.txt', 'order.txt']
+    return names + [os.sep.join([str(r), name]) for r in range(0, run_num) for name in run_names]
+
+
+def _complete(directory, run_num, binary):
+    """ check whether a directory holds the preprocessed files of all runs """
+    return all(os.path.exists(os.sep.join([directory, name])) for name in _file_names(run_num, binary))
+
+
+def fingerprint(directory, run_num):
+    """ return the fingerprint of the contents of the preprocessed files of a dataset and of its first run_num runs """
+    hashes = {name: _file_hash(os.sep.join([directory, name]))
+              for binary in (False, True) for name in _file_names(run_num, binary)}
+    return hashlib.sha256(json.dumps(hashes, sort_keys=True).encode()).hexdigest()
+
+
+def preprocess(pre, binary=False, processes=1):
+    """ read or generate the dataset, write its files and return their directory """
+    if pre.N:
+        pre.simulate()
+    else:
+        pre.read_data()
+    pre.formalize(binary, processes)
+    return pre.output
+
+
+def prepare(pre, binary=False, processes=1, keep=None):
+    """
+    return the directory of the files written by a preprocessor, preprocessing the dataset only if no cache entry
+    matches, and keep the keep most recently used entries if keep is given
+    """
+    entry_key = key(pre, binary)
+    if entry_key is None:
+        return preprocess(pre, binary, processes)
+
+    root = os.sep.join([pre.dataset, 'cache'])
+    entry = os.sep.join([root, entry_key])
+    if os.path.isdir(entry):
+        # mark the entry as recently used
+        os.utime(entry)
+    else:
+        os.makedirs(root, exist_ok=True)
+        # the files are written to a temporary directory, which becomes the entry once they are complete
+        temp = tempfile.mkdtemp(prefix=entry_key + '.', dir=root)
+        try:
+            pre.output = temp
+            preprocess(pre, binary, processes)
+            if not _complete(temp, pre.run_num, binary):
+                raise RuntimeError(f'the preprocessing of {pre.dataset} did not write all files')
+            try:
+                os.rename(temp, entry)
+            except OSError:
+                # the entry was written by a concurrent preprocessing in the meantime
+                if not os.path.isdir(entry):
+                    raise
+        finally:
+            pre.output = pre.dataset
+            shutil.rmtree(temp, ignore_errors=True)
+    if keep is not None:
+        evict(root, keep, entry)
+    return entry
+
+
+def entries(root):
+    """ return the cache entries in a cache directory, from the most to the least recently used """
+    if not os.path.isdir(root):
+        return []
+    paths = [os.sep.join([root, name]) for name in os.listdir(root) if '.' not in name]
+    paths = [path for path in paths if os.path.isdir(path)]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def evict(root, keep, current=None):
+    """ remove all but the keep most recently used cache entries, always keeping the current entry """
+    kept = 0
+    for path in entries(root):
+        if path == current or kept < keep:
+            kept += 1
+            continue
+        shutil.rmtree(path, ignore_errors=True)
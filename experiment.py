@@ -0,0 +1,180 @@
+"""
+#In-process API of TDADP for notebooks and scripts. A Dataset handle parses a preprocessed dataset once, including the
+#attack and the requesting order of each run, and can be passed to any number of experiments. run_experiment executes
+#the runs of an experiment with the given parameters and returns an ExperimentResult holding the per-run A-Accuracy,
+#E-Number, T-Cost, running time and profile with their statistics, without printing anything or writing files.
+"""
+import math
+import multiprocessing
+
+import numpy as np
+
+from tdadp import Tdadp
+
+# per-run measurements of an experiment
+MEASUREMENTS = ('a_accuracy', 'e_number', 't_cost', 'running_time')
+
+# dataset handle shared with the forked run processes
+_shared = {}
+
+
+class Dataset:
+    """ preprocessed dataset parsed once, with the attack and the requesting order of each run """
+
+    def __init__(self, path, run_num):
+        self.path = path
+        self.run_num = run_num
+        self.tdssa = Tdadp(0, 0, 0, 0)  # holds the parsed workers and tasks, and runs the experiments
+        self.tdssa.read_normal(path)
+        self.tdssa.read_golden(path)
+        self.attacks = []  # attack of each run, as returned by Tdadp.parse_attack
+        self.orders = []  # requesting order of each run
+        for r in range(0, run_num):
+            self.attacks.append(self.tdssa.parse_attack(path, r))
+            self.tdssa.read_order(path, r)
+            self.orders.append(self.tdssa.order)
+        self.tdssa.order = []
+
+    def get_path(self):
+        return self.path
+
+    def get_run_num(self):
+        return self.run_num
+
+    def get_worker_num(self):
+        return len(self.tdssa.id_to_worker)
+
+    def get_task_num(self):
+        return len(self.tdssa.id_to_task)
+
+    # noinspection PyPep8Naming
+    def set_params(self, B, alpha, tau, delta, seed=None, vectorized=False, incremental=False, profile=False,
+                   convergence=None, shards=1, sync_interval=1000, checkpoint_dir=None, checkpoint_interval=10000):
+        """ set the parameters of the following runs (see Tdadp) """
+        tdssa = self.tdssa
+        tdssa.B = B
+        tdssa.alpha = alpha
+        tdssa.tau = tau
+        tdssa.delta = delta
+        tdssa.seed = seed
+        tdssa.vectorized = vectorized
+        tdssa.incremental = incremental
+        tdssa.profile = profile
+        tdssa.convergence = convergence or {}
+        tdssa.shards = shards
+        tdssa.sync_interval = sync_interval
+        tdssa.checkpoint_dir = checkpoint_dir
+        tdssa.checkpoint_interval = checkpoint_interval
+
+    def run(self, r):
+        """ execute the rth run with the current parameters and return its measurements and profile """
+        tdssa = self.tdssa
+        tdssa.read_golden(self.path)
+        tdssa.set_attack(r, self.attacks[r])
+        tdssa.order = self.orders[r]
+        tdssa.run()
+        tdssa.order = []
+        return (tdssa.get_a_accuracy(), tdssa.get_e_number(), tdssa.get_t_cost(), tdssa.get_running_time(),
+                tdssa.get_profile())
+
+
+def load_dataset(path, run_num):
+    """ parse a preprocessed dataset and its first run_num runs """
+    return Dataset(path, run_num)
+
+
+class ExperimentResult:
+    """ per-run measurements and profiles of an experiment, with their statistics """
+
+    def __init__(self, params, runs, results):
+        self.params = params  # parameters of the experiment
+        self.runs = np.asarray(runs, dtype=np.int64)  # indexes of the executed runs
+        self.a_accuracy = np.array([result[0] for result in results], dtype=np.float64)  # aggregation accuracy
+        self.e_number = np.array([result[1] for result in results], dtype=np.int64)  # exposed golden tasks
+        self.t_cost = np.array([result[2] for result in results], dtype=np.float64)  # golden tasks per worker
+        self.running_time = np.array([result[3] for result in results], dtype=np.float64)  # running time (ms)
+        self.profiles = [result[4] for result in results]  # time (s) and counters of the phases, if profiled
+
+    def mean(self, name):
+        """ return the average of a measurement over the runs """
+        values = getattr(self, name).tolist()
+        return sum(values) / len(values)
+
+    def standard_error(self, name):
+        """ return the standard error of a measurement over the runs """
+        values = getattr(self, name).tolist()
+        if len(values) < 2:
+            return 0.0
+        mean = sum(values) / len(values)
+        error = 0
+        for value in values:
+            error += math.pow(mean - value, 2)
+        return math.sqrt(error / (len(values) - 1)) / math.sqrt(len(values))
+
+    def summary(self):
+        """ return the average and the standard error of each measurement """
+        return {name: (self.mean(name), self.standard_error(name)) for name in MEASUREMENTS}
+
+    def average_profile(self):
+        """ return the average time and counters of the phases over the runs, or {} if they are not profiled """
+        if not self.profiles or not self.profiles[0]:
+            return {}
+        return {name: sum(profile[name] for profile in self.profiles) / len(self.profiles) for name in self.profiles[0]}
+
+
+def _run_shared(r):
+    """ execute the rth run in a forked process on its own copy of the shared dataset """
+    return _shared['dataset'].run(r)
+
+
+# noinspection PyPep8Naming
+def iter_runs(dataset, B, alpha, tau, delta, runs=None, processes=1, seed=None, vectorized=False, incremental=False,
+              profile=False, convergence=None, shards=1, sync_interval=1000, checkpoint_dir=None,
+              checkpoint_interval=10000):
+    """
+    yield the measurements and profile of each run of an experiment in run order, executing the runs in parallel if
+    several processes are given. All runs of the dataset are executed if runs is not given
+    """
+    runs = list(range(0, dataset.get_run_num()) if runs is None else runs)
+    dataset.set_params(B, alpha, tau, delta, seed, vectorized, incremental, profile, convergence, shards, sync_interval,
+                       checkpoint_dir, checkpoint_interval)
+
+    if processes <= 1 or len(runs) <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for r in runs:
+            yield dataset.run(r)
+        return
+
+    # each run is executed by a freshly forked process, which shares the parsed dataset copy-on-write and starts from
+    # the state of the dataset before any run
+    _shared['dataset'] = dataset
+    try:
+        context = multiprocessing.get_context('fork')
+        with context.Pool(min(processes, len(runs)), maxtasksperchild=1) as pool:
+            for result in pool.imap(_run_shared, runs):
+                yield result
+    finally:
+        _shared.clear()
+
+
+# noinspection PyPep8Naming
+def run_experiment(dataset, B, alpha, tau, delta, runs=None, processes=1, seed=None, vectorized=False,
+                   incremental=False, profile=False, convergence=None, shards=1, sync_interval=1000,
+                   checkpoint_dir=None, checkpoint_interval=10000, on_run=None):
+    """
+    execute the runs of an experiment on a dataset handle and return its results (see iter_runs), passing the index
+    and the measurements of each finished run to on_run if given
+    """
+    params = {
+        'B': B, 'alpha': alpha, 'tau': tau, 'delta': delta, 'seed': seed, 'vectorized': vectorized,
+        'incremental': incremental, 'profile': profile, 'convergence': dict(convergence or {}), 'shards': shards,
+        'sync_interval': sync_interval,
+    }
+    runs = list(range(0, dataset.get_run_num()) if runs is None else runs)
+    results = []
+    for r, result in zip(runs, iter_runs(dataset, B, alpha, tau, delta, runs, processes, seed, vectorized, incremental,
+                                         profile, convergence, shards, sync_interval, checkpoint_dir,
+                                         checkpoint_interval)):
+        results.append(result)
+        if on_run is not None:
+            on_run(r, result)
+    return ExperimentResult(params, runs, results)
@@ -1,52 +1,220 @@
-
  #Provides the truth inference, which iteratively infers the true answer of tasks and the quality of workers  with the trust score and reliability score of workers.
+ #In incremental mode, the inference warm-starts from the aggregated labels and weights of the previous call and only
+ #revisits the frontier of tasks and workers whose labels changed since then.
+ #The iterations stop once no aggregated label changes, or earlier under the optional convergence criteria: a bound on
+ #the iterations, a fraction of changed labels, a tolerance on the change of worker weights or a 2-cycle of labels
+ #flipping back and forth. Each call reports its iterations, residuals and the criterion that stopped it.
 
 
 class ExtendedTD:
 
     # noinspection PyPep8Naming
-    def __init__(self, L):
+    def __init__(self, L, incremental=False, max_iterations=1000, changed_fraction=0.0, weight_tolerance=None,
+                 detect_cycles=False):
         self.L = L
+        self.incremental = incremental  # indicates whether to warm-start from the previous call
+        self.max_iterations = max_iterations  # maximum number of iterations per call
+        self.changed_fraction = changed_fraction  # stop once at most this fraction of the evaluated labels changes
+        self.weight_tolerance = weight_tolerance  # stop once no weight changes by more than this, if set
+        self.detect_cycles = detect_cycles  # indicates whether to stop when labels flip back to those of two iterations ago
+        self.warm = False  # indicates whether a previous call produced aggregated labels and weights
+        self.weighted = set()  # workers whose weight has been initialized by the inference
+        self.dirty_tasks = set()  # tasks whose labels changed since the previous call
+        self.dirty_workers = set()  # workers whose labels or scores changed since the previous call
+        self.evaluated = 0  # number of tasks re-evaluated in the previous call
+        self.iterations = 0  # number of iterations of the previous call
+        self.stats = {}  # iterations, residuals and stopping criterion of the previous call
+
+    def mark_task(self, task):
+        """ record that the labels on a task changed """
+        if self.incremental:
+            self.dirty_tasks.add(task)
+
+    def mark_worker(self, worker):
+        """ record that the labels or scores of a worker changed """
+        if self.incremental:
+            self.dirty_workers.add(worker)
+
+    def get_evaluated(self):
+        """ return the number of tasks re-evaluated in the previous call """
+        return self.evaluated
+
+    def get_iterations(self):
+        """ return the number of iterations of the previous call """
+        return self.iterations
+
+    def get_stats(self):
+        """ return the iterations, residuals and stopping criterion of the previous call """
+        return self.stats
 
     def process(self, tasks, workers):
-        # iteratively run truth inference
+        """ iteratively run truth inference and return the statistics of the call """
+        if self.incremental and self.warm:
+            return self._process_frontier(tasks, workers)
+
         # set the initial weight of workers to their accuracy on golden tasks
         for worker in workers:
             worker.set_weight(worker.get_p())
 
         iteration = 0
-        while iteration < 1000:
+        changes = {}  # previous label of each task changed by the previous iteration
+        reason = 'max_iterations'
+        difference = 0
+        weight_delta = 0.0
+        while iteration < self.max_iterations:
             iteration += 1
-            difference = 0
 
             # task aggregation
-            for task in tasks:
-                original_label = task.get_aggregated()
-                assigned = task.get_assigned()
-                votes = [0] * self.L
-                for worker in assigned:
-                    label = worker.get_labeled_pairs()[task]
-                    votes[label] = votes[label] + worker.get_s() / self.L + (1 - worker.get_s()) * worker.get_weight()
-                max_vote = -1
-                for i in range(0, self.L):
-                    if votes[i] > max_vote:
-                        task.set_aggregated(i)
-                        max_vote = votes[i]
-                if original_label != task.get_aggregated():
-                    difference += 1
+            difference, changes, cycle = self._aggregate_all(tasks, changes)
 
             # terminate if converge
-            if difference == 0:
+            reason = self._stop_reason(difference, len(tasks), cycle)
+            if reason:
                 break
 
             # weight estimation
-            for worker in workers:
-                correct = 0
-                count = 0
-                assigned = worker.get_labeled_pairs()
-                for task in assigned.keys():
-                    if assigned[task] == task.get_aggregated():
-                        correct += task.get_ci()
-                    count += task.get_ci()
-                if count > 0:
-                    worker.set_weight(correct / count)
+            weight_delta = self._estimate_all(workers)
+            if self.weight_tolerance is not None and weight_delta <= self.weight_tolerance:
+                reason = 'weight_tolerance'
+                break
+        else:
+            reason = 'max_iterations'
+        return self._finish(len(tasks), workers, self._call_stats(iteration, difference, weight_delta, reason))
+
+    def _process_frontier(self, tasks, workers):
+        """ warm-start the inference and only revisit tasks reachable from changed tasks and workers """
+        # workers new to the inference start from their accuracy on golden tasks
+        for worker in workers:
+            if worker not in self.weighted:
+                worker.set_weight(worker.get_p())
+                self.dirty_workers.add(worker)
+
+        frontier = set()
+        for task in self.dirty_tasks:
+            if task in tasks:
+                frontier.add(task)
+        for worker in self.dirty_workers:
+            for task in worker.get_labeled_pairs().keys():
+                if task in tasks:
+                    frontier.add(task)
+            # the labeled pairs changed, so re-estimate the weight
+            if worker in workers:
+                self._estimate(worker)
+
+        evaluated = set()
+        iteration = 0
+        changes = {}
+        reason = 'converged'
+        difference = 0
+        weight_delta = 0.0
+        while frontier:
+            if iteration >= self.max_iterations:
+                reason = 'max_iterations'
+                break
+            iteration += 1
+
+            # task aggregation
+            evaluated.update(frontier)
+            difference, changes, cycle = self._aggregate_all(frontier, changes)
+
+            # terminate if converge
+            reason = self._stop_reason(difference, len(frontier), cycle)
+            if reason:
+                break
+
+            # weight estimation of workers who labeled a changed task
+            affected = set()
+            for task in changes:
+                for worker in task.get_assigned():
+                    if worker in workers:
+                        affected.add(worker)
+            weight_delta = self._estimate_all(affected)
+            if self.weight_tolerance is not None and weight_delta <= self.weight_tolerance:
+                reason = 'weight_tolerance'
+                break
+            frontier = set()
+            for worker in affected:
+                for task in worker.get_labeled_pairs().keys():
+                    if task in tasks:
+                        frontier.add(task)
+        else:
+            reason = reason or 'converged'
+        return self._finish(len(evaluated), workers, self._call_stats(iteration, difference, weight_delta, reason))
+
+    def _aggregate_all(self, tasks, previous):
+        """
+        aggregate the labels on the tasks and return the number of changed labels, the previous label of each changed
+        task and whether the changes undo those of the previous iteration
+        """
+        changes = {}
+        for task in tasks:
+            original_label = task.get_aggregated()
+            if self._aggregate(task):
+                changes[task] = original_label
+        cycle = False
+        if self.detect_cycles and changes and len(changes) == len(previous):
+            cycle = all(task in previous and task.get_aggregated() == previous[task] for task in changes)
+        return len(changes), changes, cycle
+
+    def _estimate_all(self, workers):
+        """ estimate the weight of the workers and return the largest change of a weight """
+        weight_delta = 0.0
+        for worker in workers:
+            weight = worker.get_weight()
+            self._estimate(worker)
+            weight_delta = max(weight_delta, abs(worker.get_weight() - weight))
+        return weight_delta
+
+    def _stop_reason(self, difference, total, cycle):
+        """ return the criterion met by an aggregation changing difference of the total labels, or None """
+        if difference == 0:
+            return 'converged'
+        if difference <= self.changed_fraction * total:
+            return 'changed_fraction'
+        if cycle:
+            return 'cycle'
+        return None
+
+    @staticmethod
+    def _call_stats(iterations, changed, weight_delta, reason):
+        """ return the statistics of a call: its iterations, the labels changed by its last aggregation, the largest
+        weight change of its last estimation and the criterion that stopped it """
+        return {'iterations': iterations, 'changed': changed, 'weight_delta': weight_delta, 'reason': reason}
+
+    def _finish(self, evaluated, workers, stats):
+        """ record the state for warm-starting the next call and return the statistics of the call """
+        self.evaluated = evaluated
+        self.iterations = stats['iterations']
+        self.stats = stats
+        self.warm = True
+        self.weighted.update(workers)
+        self.dirty_tasks = set()
+        self.dirty_workers = set()
+        return stats
+
+    def _aggregate(self, task):
+        """ aggregate the labels on a task and return whether the aggregated label changed """
+        original_label = task.get_aggregated()
+        assigned = task.get_assigned()
+        votes = [0] * self.L
+        for worker in assigned:
+            label = worker.get_labeled_pairs()[task]
+            votes[label] = votes[label] + worker.get_s() / self.L + (1 - worker.get_s()) * worker.get_weight()
+        max_vote = -1
+        for i in range(0, self.L):
+            if votes[i] > max_vote:
+                task.set_aggregated(i)
+                max_vote = votes[i]
+        return original_label != task.get_aggregated()
+
+    def _estimate(self, worker):
+        """ estimate the weight of a worker from the aggregated labels """
+        correct = 0
+        count = 0
+        assigned = worker.get_labeled_pairs()
+        for task in assigned.keys():
+            if assigned[task] == task.get_aggregated():
+                correct += task.get_ci()
+            count += task.get_ci()
+        if count > 0:
+            worker.set_weight(correct / count)
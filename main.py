@@ -1,10 +1,11 @@
-import math
 import os
 import sys
 import traceback
 
+import checkpoint
+import dataset_cache
+import experiment
 from preprocess import Preprocess
-from tdadp import Tdadp
 
 
 def _output_to_console_and_file(lines, file):
@@ -14,8 +15,58 @@ def _output_to_console_and_file(lines, file):
         file.write(line + '\n')
 
 
+def _profile_line(profile):
+    """ format the time and counters of the phases of a run """
+    fields = [f'{name[:-5]}:{profile[name] * 1000:.3f}ms' if name.endswith('_time') else f'{name}:{profile[name]}'
+              for name in profile]
+    if profile.get('etd_calls'):
+        fields.append(f'etd_iterations_per_call:{profile["etd_iterations"] / profile["etd_calls"]}')
+    return 'Profile --- ' + '  '.join(fields)
+
+
 # noinspection PyPep8Naming
-def main(args):
+def main(args, processes=1, binary=False, seed=None, profile=False, shards=1, sync_interval=1000, checkpoint_interval=0,
+         cache=True, cache_keep=None):
+    # "--processes=N" generates and executes the runs in N parallel processes, "--binary" writes the preprocessed
+    # dataset in the binary format, "--seed=S" makes the dataset and the runs reproducible and "--profile" writes the
+    # time and counters of the phases of each run. "--max-iterations=N", "--changed-fraction=F",
+    # "--weight-tolerance=T" and "--detect-cycles" bound the iterations of each truth inference call. "--shards=N"
+    # serves the workers of each run in N hash-partitioned shards merged every "--sync-interval=N" requests.
+    # "--checkpoint=N" saves a snapshot of each run every N requests, so that an interrupted execution resumes each run
+    # from its last snapshot; the snapshots are removed once all runs are finished. With a seed, the preprocessed
+    # dataset is reused from the cache of the dataset if its parameters and source files are unchanged (see
+    # dataset_cache), unless "--no-cache" is given, and "--cache-keep=N" keeps the N most recently used cache entries
+    convergence = {}
+    options = [arg for arg in args if arg.startswith('--')]
+    for option in options:
+        if option.startswith('--processes='):
+            processes = int(option.split('=')[1])
+        elif option == '--binary':
+            binary = True
+        elif option.startswith('--seed='):
+            seed = int(option.split('=')[1])
+        elif option == '--profile':
+            profile = True
+        elif option.startswith('--max-iterations='):
+            convergence['max_iterations'] = int(option.split('=')[1])
+        elif option.startswith('--changed-fraction='):
+            convergence['changed_fraction'] = float(option.split('=')[1])
+        elif option.startswith('--weight-tolerance='):
+            convergence['weight_tolerance'] = float(option.split('=')[1])
+        elif option == '--detect-cycles':
+            convergence['detect_cycles'] = True
+        elif option.startswith('--shards='):
+            shards = int(option.split('=')[1])
+        elif option.startswith('--sync-interval='):
+            sync_interval = int(option.split('=')[1])
+        elif option.startswith('--checkpoint='):
+            checkpoint_interval = int(option.split('=')[1])
+        elif option == '--no-cache':
+            cache = False
+        elif option.startswith('--cache-keep='):
+            cache_keep = int(option.split('=')[1])
+    args = [arg for arg in args if arg not in options]
+
     if len(args) != 9 and len(args) != 14:
         print("Invalid number of parameters")
         sys.exit(0)
@@ -32,9 +83,7 @@ def main(args):
     lambd = int(args[8])
 
     if len(args) == 9:
-        pre = Preprocess.real_dataset(dataset, run_num, mu, epsilon, lambd)
-        pre.read_data()
-        pre.formalize()
+        pre = Preprocess.real_dataset(dataset, run_num, mu, epsilon, lambd, seed)
     else:
         N = int(args[9])
         M = int(args[10])
@@ -42,74 +91,49 @@ def main(args):
         K = int(args[12])
         theta = float(args[13])
 
-        pre = Preprocess.synth_dataset(dataset, run_num, mu, epsilon, lambd, N, M, L, K, theta)
-        pre.simulate()
-        pre.formalize()
+        pre = Preprocess.synth_dataset(dataset, run_num, mu, epsilon, lambd, N, M, L, K, theta, seed)
+    # directory of the preprocessed files
+    if cache:
+        source = dataset_cache.prepare(pre, binary, processes, cache_keep)
+    else:
+        source = dataset_cache.preprocess(pre, binary, processes)
 
     try:
         file_path = os.sep.join([dataset, 'result.txt'])
         with open(file_path, 'w') as file:
             # write worker number M, task number N, label size L and worker number per task K
             file.write(f'{dataset}\n')
-            # noinspection SpellCheckingInspection
-            tdssa = Tdadp(B, alpha, tau, delta)
-            tdssa.read_normal(dataset)
-
-            accuracy = [0] * run_num  # record aggregation accuracy in each run
-            exposed = [0] * run_num  # record number of exposed golden tasks in each run
-            cost = [0] * run_num  # record number of golden tasks for testing each worker in each run
-            _time = [0] * run_num  # record running time in each run
-
-            ave_a_accuracy = 0  # average aggregation accuracy
-            ave_e_number = 0  # average number of exposed golden tasks
-            ave_t_cost = 0  # average number of golden tasks for testing each worker
-            ave_running_time = 0  # average running time
+            data = experiment.load_dataset(source, run_num)
 
-            for r in range(0, run_num):
-                tdssa.read_golden(dataset)
-                tdssa.read_attack(dataset, r)
-                tdssa.read_order(dataset, r)
-                tdssa.run()
-                accuracy[r] = tdssa.get_a_accuracy()
-                exposed[r] = tdssa.get_e_number()
-                cost[r] = tdssa.get_t_cost()
-                _time[r] = tdssa.get_running_time()
-                ave_a_accuracy += tdssa.get_a_accuracy()
-                ave_e_number += tdssa.get_e_number()
-                ave_t_cost += tdssa.get_t_cost()
-                ave_running_time += tdssa.get_running_time()
-                out = f'Run {(r + 1)} --- A-Accuracy:{accuracy[r]}   T-Cost:{cost[r]}  Time:{_time[r]}ms'
+            def on_run(r, result):
+                a_accuracy, e_number, t_cost, running_time, run_profile = result
+                out = f'Run {(r + 1)} --- A-Accuracy:{a_accuracy}   T-Cost:{t_cost}  Time:{running_time}ms'
                 _output_to_console_and_file([out], file)
-
-            ave_a_accuracy /= run_num
-            ave_e_number /= run_num
-            ave_t_cost /= run_num
-            ave_running_time /= run_num
-
-            std_a_accuracy = 0  # standard error of A-Accuracy
-            std_e_number = 0  # standard error of E-Number
-            std_t_cost = 0  # standard error of T-Cost
-            std_running_time = 0  # standard error of Time
-
-            for r in range(0, run_num):
-                std_a_accuracy += math.pow(ave_a_accuracy - accuracy[r], 2)
-                std_e_number += math.pow(ave_e_number - exposed[r], 2)
-                std_t_cost += math.pow(ave_t_cost - cost[r], 2)
-                std_running_time += math.pow(ave_running_time - _time[r], 2)
-
-            std_a_accuracy = math.sqrt(std_a_accuracy / (run_num - 1)) / math.sqrt(run_num)
-            std_e_number = math.sqrt(std_e_number / (run_num - 1)) / math.sqrt(run_num)
-            std_t_cost = math.sqrt(std_t_cost / (run_num - 1)) / math.sqrt(run_num)
-               # (long) (Math.sqrt(std_running_time/(run_num - 1))/Math.sqrt(run_num))
-            std_running_time = int(math.sqrt(std_running_time // (run_num - 1)) / math.sqrt(run_num))
+                if run_profile:
+                    _output_to_console_and_file([_profile_line(run_profile)], file)
+
+            results = experiment.run_experiment(
+                data, B, alpha, tau, delta, processes=processes, seed=seed, profile=profile, convergence=convergence,
+                shards=shards, sync_interval=sync_interval, checkpoint_dir=dataset if checkpoint_interval > 0 else None,
+                checkpoint_interval=checkpoint_interval, on_run=on_run)
+
+            summary = results.summary()
+            ave_a_accuracy, std_a_accuracy = summary['a_accuracy']
+            ave_t_cost, std_t_cost = summary['t_cost']
+            ave_running_time, std_running_time = summary['running_time']
             output_lines = [
                 '\nAverage: ',
                 f'A-Accuracy: {ave_a_accuracy}  Standard Error: {std_a_accuracy}',
-              #  f'E-Number:{ave_e_number}  Standard Error: {std_e_number}',
+              #  f'E-Number:{summary["e_number"][0]}  Standard Error: {summary["e_number"][1]}',
                 f'T-cost:{ave_t_cost}  Standard Error: {std_t_cost}',
-                f'Time:{ave_running_time}ms  Standard Error: {std_running_time}'
+                f'Time:{ave_running_time}ms  Standard Error: {int(std_running_time)}'
             ]
             _output_to_console_and_file(output_lines, file)
+            if profile:
+                _output_to_console_and_file(['\nAverage Profile: ', _profile_line(results.average_profile())], file)
+        if checkpoint_interval > 0:
+            for r in range(0, run_num):
+                checkpoint.remove(checkpoint.path(dataset, r))
     except Exception as e:
         print(e)
         traceback.print_stack()
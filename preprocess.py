@@ -1,24 +1,115 @@
 
   #Formalizing a real dataset or generate a synthetic  dataset.,
 #An "input.txt" file and a "golden.txt" file are created to indicate  the (task, worker, label) triples for the tasks. For  each run, an "attacker.txt" file and an "order.txt" file are also created to  simulate different replacements of independent workers with malicious workers and  different order of worker requests, respectively.
+#The same files can be written in the binary format of binary_dataset instead.
 
 
-import os
-import random
 import math
+import multiprocessing
+import os
 import traceback
+from array import array
 from pathlib import Path
 
+import numpy as np
+
+import binary_dataset
+import seeding
+
+
+# number of rows joined into one write
+_WRITE_ROWS = 65536
+
+# the preprocessor and the rows shared with the forked processes generating the runs
+_shared = {}
+
+
+def _formalize_run(job):
+    """ write the rth run with its own random stream """
+    run, seed = job
+    pre, attack_task_ids, request_num, binary = _shared['run']
+    pre._write_run(run, np.random.default_rng(seed), attack_task_ids, request_num, binary)
+
+
+def _join_pairs(first, second):
+    """ return the "first\tsecond\t" field pairs of two arrays """
+    return [f'{a}\t{b}\t' for a, b in zip(first.tolist(), second.tolist())]
+
+
+def _write_rows(file, columns, offsets, first, second):
+    """
+    write one line per row, made of the fields of the row in the columns followed by the (first, second) field pairs
+    between offsets[i] and offsets[i + 1], joining a chunk of rows into one write
+    """
+    for start in range(0, len(offsets) - 1, _WRITE_ROWS):
+        end = min(start + _WRITE_ROWS, len(offsets) - 1)
+        rows = zip(*[column[start:end].tolist() for column in columns])
+        heads = [''.join(f'{field}\t' for field in row) for row in rows]
+        base = offsets[start]
+        pairs = _join_pairs(first[base:offsets[end]], second[base:offsets[end]])
+        file.write(''.join([heads[i - start] + ''.join(pairs[offsets[i] - base:offsets[i + 1] - base]) + '\n'
+                            for i in range(start, end)]))
+
+
+def _read_columns(file_path, column_num, chunk_size=1 << 22):
+    """
+    yield the first column_num columns of the rows of a CSV file after its header, one chunk of about chunk_size bytes at
+    a time
+    """
+    with open(file_path) as file:
+        file.readline()
+        lines = file.readlines(chunk_size)
+        while lines:
+            fields = ''.join(lines).rstrip('\n').replace('\n', ',').split(',')
+            if len(fields) == len(lines) * column_num:
+                yield [fields[i::column_num] for i in range(0, column_num)]
+            else:
+                # rows with extra columns or blank lines
+                rows = [line.split(',')[0:column_num] for line in lines if line.strip()]
+                yield [[row[i] for row in rows] for i in range(0, column_num)]
+            lines = file.readlines(chunk_size)
+
+
+def _dict_order(keys):
+    """
+    return the index of the first and of the last appearance of each distinct key in order of first appearance, and the
+    position of each key among the distinct keys, like the keys of a dict filled in order
+    """
+    keys = np.asarray(keys)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    last = np.zeros(len(first), dtype=np.int64)
+    np.maximum.at(last, inverse, np.arange(len(keys)))
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return first[order], last[order], rank[inverse.ravel()]
+
+
+def _lookup(keys, queries):
+    """ return the index of each query among distinct keys and whether the query is found """
+    if len(keys) == 0:
+        return np.zeros(len(queries), dtype=np.int64), np.zeros(len(queries), dtype=bool)
+    sorter = np.argsort(keys)
+    index = sorter[np.minimum(np.searchsorted(keys, queries, sorter=sorter), len(keys) - 1)]
+    return index, keys[index] == queries
+
+
+def _dict_items(keys, values):
+    """ return the distinct keys in order of first appearance with the last value of each, like the items of a dict """
+    first, last, _ = _dict_order(np.asarray(keys, dtype=np.int64))
+    return np.asarray(keys, dtype=np.int64)[first], np.asarray(values, dtype=np.int64)[last]
+
 
 class Preprocess:
 
     # noinspection PyPep8Naming
-    def __init__(self, dataset, run_num, mu, epsilon, lamb, N=0, M=0, L=0, K=0, theta=0):
+    def __init__(self, dataset, run_num, mu, epsilon, lamb, N=0, M=0, L=0, K=0, theta=0, seed=None):
         """
         Initialization for real datasets  when used without default parameters.
          Initialization for synthetic datasets otherwise
         """
         self.dataset = dataset
+        self.output = dataset  # directory of the preprocessed files (see dataset_cache)
         self.run_num = run_num  # number of test runs
         self.golden_num = 20  # number of golden tasks (20 by default)
         self.mu = mu  # percentage of malicious workers
@@ -30,25 +121,33 @@ class Preprocess:
         self.K = K  # number of workers per normal task
         self.theta = theta  # average worker accuracy
         self.has_golden = False  # indicates whether golden tasks are provided
-
-        self.worker_normal_labels = {}  # (task, label) pairs of each worker on normal tasks
-        self.normal_workers = {}  # workers on each normal task
-        self.normal_truth = {}  # true label of each normal task
-        self.worker_golden_labels = {}  # (golden task, label) pairs of each worker on golden tasks
-        self.golden_truth = {}  # true label of each golden task
+        self.seed = seed  # seed of the random streams, or None for fresh entropy
+
+        # (task, worker, label) answers on normal tasks and on golden tasks, with workers interned as contiguous IDs in
+        # order of first appearance, and the true labels of normal tasks and golden tasks, kept in typed arrays
+        self.answer_tasks = array('q')
+        self.answer_workers = array('i')
+        self.answer_labels = array('i')
+        self.truth_tasks = array('q')
+        self.truth_labels = array('i')
+        self.quali_tasks = array('q')
+        self.quali_workers = array('i')
+        self.quali_labels = array('i')
+        self.golden_tasks = array('q')
+        self.golden_truth = array('i')
         self.attacker_sybils = {}  # malicious workers of each attacker
         self.worker_id = {}  # worker to id mapping
 
     @classmethod
-    def real_dataset(cls, dataset, run_num, mu, epsilon, lamb):
+    def real_dataset(cls, dataset, run_num, mu, epsilon, lamb, seed=None):
         """ Initialization for real datasets (NLP and DOG) """
-        return cls(dataset, run_num, mu, epsilon, lamb)
+        return cls(dataset, run_num, mu, epsilon, lamb, seed=seed)
 
     # noinspection PyPep8Naming
     @classmethod
-    def synth_dataset(cls, dataset, run_num, mu, epsilon, lamb, N, M, L, K, theta):
+    def synth_dataset(cls, dataset, run_num, mu, epsilon, lamb, N, M, L, K, theta, seed=None):
         """ Initialization for synthetic datasets (SYN) """
-        return cls(dataset, run_num, mu, epsilon, lamb, N, M, L, K, theta)
+        return cls(dataset, run_num, mu, epsilon, lamb, N, M, L, K, theta, seed)
 
     def read_data(self):
         """
@@ -59,144 +158,101 @@ class Preprocess:
         """
         # noinspection PyBroadException
         try:
-            with open(self._file_path('answer.csv')) as answer_file:
-                answer_file.readline()
-                answer_line = answer_file.readline()
-                _id = 0
-                self.L = 0
-                self.K = 0
-                while answer_line:
-                    elements = answer_line.split(",")
-                    task = int(elements[0])
-                    # map string ID to integer ID
-                    worker = _id
-                    if elements[1] in self.worker_id.keys():
-                        worker = self.worker_id[elements[1]]
-                    else:
-                        self.worker_id[elements[1]] = worker
-                        _id += 1
-                    label = int(elements[2])
-                    if label + 1 > self.L:
-                        self.L = label + 1
-
-                    # update worker_normal_labels
-                    normal_labels = self.worker_normal_labels.get(worker)
-                    if not normal_labels:
-                        normal_labels = {}
-                    normal_labels[task] = label
-                    self.worker_normal_labels[worker] = normal_labels
-
-                    # update normal_workers
-                    workers = self.normal_workers.get(task)
-                    if not workers:
-                        workers = []
-                    workers.append(worker)
-                    if len(workers) > self.K:
-                        self.K = len(workers)
-                    self.normal_workers[task] = workers
-
-                    answer_line = answer_file.readline()
-                self.N = len(self.normal_workers)
-                self.M = len(self.worker_id)
-
-            with open(self._file_path('truth.csv')) as truth_file:
-                truth_file.readline()
-                truth_line = truth_file.readline()
-                while truth_line:
-                    elements = truth_line.split(",")
-                    task = int(elements[0])
-                    truth = int(elements[1])
-
-                    # update normal_truth
-                    self.normal_truth[task] = truth
-
-                    truth_line = truth_file.readline()
+            worker_id = self.worker_id
+            for tasks, workers, labels in _read_columns(self._file_path('answer.csv'), 3):
+                self.answer_tasks.extend(map(int, tasks))
+                # map string ID to integer ID
+                self.answer_workers.extend([worker_id.setdefault(worker, len(worker_id)) for worker in workers])
+                self.answer_labels.extend(map(int, labels))
+            tasks, counts = np.unique(np.asarray(self.answer_tasks), return_counts=True)
+            self.L = max(self.answer_labels) + 1 if self.answer_labels else 0
+            self.K = int(counts.max()) if len(counts) else 0
+            self.N = len(tasks)
+            self.M = len(worker_id)
+
+            for tasks, truths in _read_columns(self._file_path('truth.csv'), 2):
+                self.truth_tasks.extend(map(int, tasks))
+                self.truth_labels.extend(map(int, truths))
 
             if os.path.exists(self._file_path('quali.csv')):
                 self.has_golden = True
             if self.has_golden:
-                with open(self._file_path('quali.csv')) as quali_file:
-                    quali_file.readline()
-                    quali_line = quali_file.readline()
-                    while quali_line:
-                        elements = quali_line.split(",")
-                        task = int(elements[0])
-                        worker = self.worker_id[elements[1]]
-                        label = int(elements[2])
-
-                        # update worker_golden_labels
-                        golden_labels = self.worker_golden_labels.get(worker)
-                        if not golden_labels:
-                            golden_labels = {}
-                        golden_labels[task] = label
-                        self.worker_golden_labels[worker] = golden_labels
-                        quali_line = quali_file.readline()
-
-                with open(self._file_path('quali_truth.csv')) as quali_truth_file:
-                    quali_truth_file.readline()
-                    quali_truth_line = quali_truth_file.readline()
-                    while quali_truth_line:
-                        elements = quali_truth_line.split(",")
-                        task = int(elements[0])
-                        truth = int(elements[1])
-
-                        # update golden_truth
-                        self.golden_truth[task] = truth
-
-                        quali_truth_line = quali_truth_file.readline()
-
-                self.golden_num = len(self.golden_truth)
+                for tasks, workers, labels in _read_columns(self._file_path('quali.csv'), 3):
+                    self.quali_tasks.extend(map(int, tasks))
+                    self.quali_workers.extend([worker_id[worker] for worker in workers])
+                    self.quali_labels.extend(map(int, labels))
+
+                for tasks, truths in _read_columns(self._file_path('quali_truth.csv'), 2):
+                    self.golden_tasks.extend(map(int, tasks))
+                    self.golden_truth.extend(map(int, truths))
+
+                self.golden_num = len(np.unique(np.asarray(self.golden_tasks)))
 
         except Exception as e:
             print(e)
             traceback.print_stack()
             traceback.print_exc()
 
-    def simulate(self):
+    def simulate(self, seed=None, chunk_size=65536):
+        """
+        generate N tasks with K distinct workers each, where a worker stops answering once it reaches its answer cap
+        and gives the true label with probability theta. A given seed overrides the seed of the preprocessor
+        """
+        rng = seeding.generator(self.seed if seed is None else seed, seeding.SIMULATE)
+        if self.M < self.K:
+            raise ValueError(f'{self.M} workers cannot label each task {self.K} times')
         # create tasks and their true label
-        rand = random.Random()
-        for i in range(0, self.N):
-            self.normal_truth[i] = rand.randint(0, self.L - 1)
-
-        # create workers and their label on tasks
-        avail_workers = []
-        for j in range(0, self.M):
-            avail_workers.append(j)
-            self.worker_normal_labels[j] = {}
-        answer_num = self.N * self.K / self.M + 5
-        removed = []
-        for k in range(0, self.N):
-            random.shuffle(avail_workers)
-            t_workers = []
-            for t in range(0, self.K):
-                worker = avail_workers[len(avail_workers) - 1 - t]
-                task_labels = self.worker_normal_labels[worker]
-                truth = self.normal_truth[k]
-                if rand.random() <= self.theta:
-                    task_labels[k] = truth
-                else:
-                    label = rand.randint(0, self.L - 1)
-                    while label == truth:
-                        label = rand.randint(0, self.L - 1)
-                    task_labels[k] = label
-                self.worker_normal_labels[worker] = task_labels
-                if len(task_labels) == answer_num:
-                    removed.append(worker)
-                t_workers.append(worker)
-            avail_workers = []
-            for p in range(0, self.M):
-                if p not in removed:
-                    avail_workers.append(p)
-            self.normal_workers[k] = t_workers
-
-    def replace(self):
+        truth = rng.integers(0, self.L, self.N)
+        # a wrong label is drawn uniformly from the other L - 1 labels
+        correct = rng.random((self.N, self.K)) <= self.theta
+        shift = rng.integers(1, max(self.L, 2), (self.N, self.K))
+        labels = np.where(correct, truth[:, None], (truth[:, None] + shift) % max(self.L, 1))
+
+        # choose the workers of each task by a partial Fisher-Yates shuffle over the pool of available workers, where
+        # a worker reaching the cap is swapped out of the pool after the task
+        answer_cap = math.ceil(self.N * self.K / self.M + 5)
+        pool = list(range(0, self.M))
+        position = list(range(0, self.M))
+        size = self.M
+        answers = [0] * self.M
+        workers = np.empty((self.N, self.K), dtype=np.int64)
+        for start in range(0, self.N, chunk_size):
+            draws = rng.random((min(chunk_size, self.N - start), self.K)).tolist()
+            for k, task_draws in enumerate(draws, start):
+                if size < self.K:
+                    raise ValueError(f'the answer cap {answer_cap} leaves {size} workers for task {k}')
+                for t in range(0, self.K):
+                    j = t + int(task_draws[t] * (size - t))
+                    pool[t], pool[j] = pool[j], pool[t]
+                    position[pool[t]] = t
+                    position[pool[j]] = j
+                t_workers = pool[0:self.K]
+                workers[k] = t_workers
+                for worker in t_workers:
+                    answers[worker] += 1
+                    if answers[worker] == answer_cap:
+                        size -= 1
+                        last = pool[size]
+                        i = position[worker]
+                        pool[i], pool[size] = last, worker
+                        position[last], position[worker] = i, size
+
+        # record the (task, worker, label) triples
+        self.truth_tasks = np.arange(self.N, dtype=np.int64)
+        self.truth_labels = truth
+        self.answer_tasks = np.repeat(self.truth_tasks, self.K)
+        self.answer_workers = workers.ravel()
+        self.answer_labels = labels.ravel()
+
+    def replace(self, rng=None):
         """
         replace mu percentage of independent normal workers with malicious workers
         and equally assign malicious workers to lambda attackers
         """
+        rng = rng if rng is not None else np.random.default_rng()
         self.attacker_sybils = {}
         # decide the number of malicious workers for each attacker
-        num = math.ceil(len(self.worker_normal_labels) * self.mu)
+        num = math.ceil(self.M * self.mu)
         attacker_sybil_num = [0] * self.lamb
         for i in range(0, self.lamb):
             # "(int) Math.floor(num/lambda)" 
@@ -204,8 +260,7 @@ class Preprocess:
         attacker_sybil_num[self.lamb - 1] = num - attacker_sybil_num[0] * (self.lamb - 1)
 
         # update attacker_trust score by randomly assigning independent workers to each attacker as malicious workers
-        temp_workers = list(self.worker_normal_labels.keys())
-        random.shuffle(temp_workers)
+        temp_workers = rng.permutation(self.M).tolist()
         for j in range(0, self.lamb):
             workers = []
             for k in range(0, attacker_sybil_num[j]):
@@ -213,118 +268,180 @@ class Preprocess:
                 workers.append(worker)
             self.attacker_sybils[j] = workers
 
-    def formalize(self):
+    def formalize(self, binary=False, processes=1):
         """
         write the overall data info into input.txt and write the information
-        of data poisoning attack, golden tasks and request order for each run
+        of data poisoning attack, golden tasks and request order for each run,
+        or write them in the binary format of binary_dataset if binary is set.
+        The runs are generated in parallel by the given number of processes
         """
-        rand = random.Random()
         try:
-            with open(self._file_path('input.txt'), 'w') as input_file:
-                # write worker number M, task number N, label size L and worker number per task K
-                input_file.write(f'{self.M}\t{self.N}\t{self.L}\t{self.K}\n')
-                for task in self.normal_truth.keys():
-                    # write task ID, true label and number of workers for each task
-                    input_file.write(f'{task}\t{self.normal_truth[task]}\t{len(self.normal_workers[task])}\t')
-                    # write worker ID and corresponding label
-                    for worker in self.normal_workers[task]:
-                        input_file.write(f'{worker}\t{self.worker_normal_labels[worker][task]}\t')
-                    input_file.write('\n')
-
-            with open(self._file_path('golden.txt'), 'w') as golden_file:
-                golden_file.write(f'{self.golden_num}\n')
-                if self.has_golden:
-                    # write the true label of each golden task
-                    for golden in self.golden_truth.keys():
-                        golden_file.write(f'{golden}\t{self.golden_truth[golden]}\t')
-                    golden_file.write('\n')
-                    # write the label of each worker on each golden task
-                    for worker in self.worker_golden_labels.keys():
-                        golden_file.write(f'{worker}\t')
-                        golden_labels = self.worker_golden_labels[worker]
-                        for golden in golden_labels.keys():
-                            golden_file.write(f'{golden}\t{golden_labels[golden]}\t')
-                        golden_file.write('\n')
+            task_ids, true_labels, offsets, worker_ids, labels = self._normal_rows()
+            # the number of tasks labeled by each worker and the number of them labeled correctly
+            task_num, correct_num = self._worker_answers()
+            golden_rows = self._golden_rows(seeding.generator(self.seed, seeding.GOLDEN), task_num, correct_num)
+            if binary:
+                binary_dataset.save_normal(self.output, self.M, self.N, self.L, self.K, task_ids, true_labels, offsets,
+                                           worker_ids, labels)
+                binary_dataset.save_golden(self.output, self.L, *golden_rows)
+            else:
+                self._write_input(task_ids, true_labels, offsets, worker_ids, labels)
+                self._write_golden(*golden_rows)
+
+            # the tasks randomized by each attacker: normal tasks followed by golden tasks
+            attack_task_ids = np.concatenate([task_ids, golden_rows[0]])
+            # the number of requests of each worker
+            request_num = task_num + self.golden_num
+            # each run draws from its own random stream
+            jobs = [(run, seeding.seed_sequence(self.seed, seeding.RUN, run)) for run in range(0, self.run_num)]
+            _shared['run'] = (self, attack_task_ids, request_num, binary)
+            try:
+                if processes <= 1 or len(jobs) <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+                    for job in jobs:
+                        _formalize_run(job)
                 else:
-                    # generate golden tasks
-                    golden_labels = [0] * self.golden_num
-                    for i in range(0, self.golden_num):
-                        golden_labels[i] = rand.randint(0, self.L - 1)
-                        golden_file.write(f'{-1 - i}\t{golden_labels[i]}\t')
-                    golden_file.write('\n')
-                    # determine the label provided by each worker on golden tasks
-                    for worker in self.worker_normal_labels.keys():
-                        golden_file.write(f'{worker}\t')
-                        # compute the worker's accuracy
-                        acc = 0
-                        task_labels = self.worker_normal_labels[worker]
-                        for task in task_labels.keys():
-                            if self.normal_truth[task] == task_labels[task]:
-                                acc += 1
-                        acc = acc / len(task_labels)
-
-                        # generate the worker's label on each golden task based on the computed accuracy
-                        for i in range(0, self.golden_num):
-                            golden_file.write(f'{-1 - i}\t')
-                            if rand.random() <= acc:
-                                golden_file.write(f'{golden_labels[i]}\t')
-                            else:
-                                answer = rand.randint(0, self.L - 1)
-                                while answer == golden_labels[i]:
-                                    answer = rand.randint(0, self.L - 1)
-                                golden_file.write(f'{answer}\t')
-                        golden_file.write('\n')
-
-            for run in range(0, self.run_num):
-                dir_path = os.sep.join([self.dataset, str(run)])
-                Path(dir_path).mkdir(parents=True, exist_ok=True)
-                self.replace()
-
-                # attack.txt contains the labels randomized by each attacker and the malicious workers controlled by each
-                # attacker
-                attack_file_path = os.sep.join([self.dataset, str(run), "attack.txt"])
-                with open(attack_file_path, 'w') as attack_file:
-                    attack_file.write(f'{self.mu}\t{self.epsilon}\t{self.lamb}\n')
-                    for i in range(0, self.lamb):
-                        # write attacker ID and total number of tasks for each attacker
-                        attack_file.write(f'{i}\t{len(self.normal_truth) + self.golden_num}\t')
-                        # write task ID and randomized label for normal tasks
-                        for task in self.normal_truth.keys():
-                            attack_file.write(f'{task}\t{rand.randint(0, self.L - 1)}\t')
-                        # write task ID and randomized label for golden tasks
-                        if self.has_golden:
-                            for golden in self.golden_truth.keys():
-                                attack_file.write(f'{golden}\t{rand.randint(0, self.L - 1)}\t')
-                        else:
-                            for j in range(-1, -self.golden_num - 1, -1):
-                                attack_file.write(f'{j}\t{rand.randint(0, self.L - 1)}\t')
-                        attack_file.write('\n')
-                        workers = self.attacker_sybils.get(i)
-                        # write attacker ID and number of malicious workers for each attacker
-                        attack_file.write(f'{i}\t{len(workers)}\t')
-                        # write worker ID of replaced independent workers
-                        for worker in workers:
-                            attack_file.write(f'{worker}\t')
-                        attack_file.write('\n')
-
-                order_file_path = os.sep.join([self.dataset, str(run), "order.txt"])
-                with open(order_file_path, 'w') as order_file:
-                    order = []
-                    # decide the number of requests for each worker
-                    for worker in self.worker_normal_labels.keys():
-                        task_labels = self.worker_normal_labels[worker]
-                        for i in range(0, len(task_labels)):
-                            order.append(worker)
-                        for j in range(0, self.golden_num):
-                            order.append(worker)
-                    # randomize the request order
-                    random.shuffle(order)
-                    for worker in order:
-                        order_file.write(f'{worker}\n')
+                    # the forked processes share the rows of the dataset
+                    with multiprocessing.get_context('fork').Pool(processes) as pool:
+                        for _ in pool.imap_unordered(_formalize_run, jobs):
+                            pass
+            finally:
+                _shared.clear()
         except Exception as e:
             print(e)
             traceback.print_stack()
             traceback.print_exc()
 
+    def _write_run(self, run, rng, attack_task_ids, request_num, binary=False):
+        """ write the information of data poisoning attack and request order for the rth run """
+        dir_path = os.sep.join([self.output, str(run)])
+        Path(dir_path).mkdir(parents=True, exist_ok=True)
+        self.replace(rng)
+
+        # the labels randomized by each attacker and the malicious workers controlled by each attacker
+        attack_labels = rng.integers(0, self.L, (self.lamb, len(attack_task_ids)))
+        sybil_offsets = [0]
+        sybil_workers = []
+        for i in range(0, self.lamb):
+            sybil_workers.extend(self.attacker_sybils.get(i))
+            sybil_offsets.append(len(sybil_workers))
+
+        # decide the number of requests for each worker and randomize the request order
+        order = rng.permutation(np.repeat(np.arange(self.M, dtype=np.int32), request_num))
+
+        if binary:
+            binary_dataset.save_attack(self.output, run, self.L, self.mu, self.epsilon, attack_task_ids, attack_labels,
+                                       sybil_offsets, sybil_workers)
+            binary_dataset.save_order(self.output, run, order)
+        else:
+            self._write_attack(run, attack_task_ids, attack_labels, sybil_offsets, sybil_workers)
+            self._write_order(run, order)
+
+    def _normal_rows(self):
+        """ return the task IDs, true labels and (worker, label) rows of normal tasks """
+        truth_tasks, truth_labels = _dict_items(self.truth_tasks, self.truth_labels)
+        tasks = np.asarray(self.answer_tasks, dtype=np.int64)
+        # the row of each answer, where answers on tasks without a true label are left out
+        rows, known = _lookup(truth_tasks, tasks)
+        rows = rows[known]
+        workers = np.asarray(self.answer_workers, dtype=np.int64)[known]
+        # a worker answering a task more than once keeps the last label in every row
+        _, last, inverse = _dict_order(rows * max(self.M, 1) + workers)
+        labels = np.asarray(self.answer_labels, dtype=np.int64)[known][last][inverse]
+
+        order = np.argsort(rows, kind='stable')
+        counts = np.bincount(rows, minlength=len(truth_tasks))
+        offsets = np.zeros(np.count_nonzero(counts) + 1, dtype=np.int64)
+        np.cumsum(counts[counts > 0], out=offsets[1:])
+        return truth_tasks[counts > 0], truth_labels[counts > 0], offsets, workers[order], labels[order]
+
+    def _worker_answers(self):
+        """ return the number of distinct tasks labeled by each worker and the number of them labeled correctly """
+        tasks = np.asarray(self.answer_tasks, dtype=np.int64)
+        workers = np.asarray(self.answer_workers, dtype=np.int64)
+        _, task_index = np.unique(tasks, return_inverse=True)
+        first, last, _ = _dict_order(task_index * max(self.M, 1) + workers)
+        task_num = np.bincount(workers[first], minlength=self.M)
+
+        truth_tasks, truth_labels = _dict_items(self.truth_tasks, self.truth_labels)
+        rows, known = _lookup(truth_tasks, tasks[last])
+        correct = known & (np.asarray(self.answer_labels, dtype=np.int64)[last] == truth_labels[rows])
+        correct_num = np.bincount(workers[first][correct], minlength=self.M)
+        return task_num, correct_num
+
+    def _golden_rows(self, rng, task_num, correct_num):
+        """
+        return the golden task IDs, their true labels and the (golden task, label) rows of each worker,
+        generating golden tasks and worker labels on them if they are not provided
+        """
+        if self.has_golden:
+            golden_ids, golden_labels = _dict_items(self.golden_tasks, self.golden_truth)
+            tasks = np.asarray(self.quali_tasks, dtype=np.int64)
+            workers = np.asarray(self.quali_workers, dtype=np.int64)
+            # the (golden task, label) pairs of each worker in order of first appearance, keeping the last label
+            _, task_index = np.unique(tasks, return_inverse=True)
+            first, last, _ = _dict_order(workers * max(len(tasks), 1) + task_index)
+            worker_first, _, worker_rank = _dict_order(workers[first])
+            order = np.argsort(worker_rank, kind='stable')
+            counts = np.bincount(worker_rank, minlength=len(worker_first))
+            offsets = np.zeros(len(worker_first) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            return (golden_ids, golden_labels, workers[first][worker_first], offsets, tasks[first][order],
+                    np.asarray(self.quali_labels, dtype=np.int64)[last][order])
+
+        # generate golden tasks
+        golden_ids = -1 - np.arange(self.golden_num, dtype=np.int64)
+        golden_labels = rng.integers(0, self.L, self.golden_num)
+        # the accuracy of each worker on normal tasks
+        acc = correct_num / np.maximum(task_num, 1)
+        # generate the worker's label on each golden task based on the accuracy, where a wrong label is drawn uniformly
+        # from the other labels
+        correct = rng.random((self.M, self.golden_num)) <= acc[:, None]
+        shift = rng.integers(1, max(self.L, 2), (self.M, self.golden_num))
+        labels = np.where(correct, golden_labels[None, :], (golden_labels[None, :] + shift) % max(self.L, 1))
+        offsets = np.arange(self.M + 1, dtype=np.int64) * self.golden_num
+        return (golden_ids, golden_labels, np.arange(self.M, dtype=np.int64), offsets, np.tile(golden_ids, self.M),
+                labels.ravel())
+
+    def _write_input(self, task_ids, true_labels, offsets, worker_ids, labels):
+        with open(os.sep.join([self.output, 'input.txt']), 'w') as input_file:
+            # write worker number M, task number N, label size L and worker number per task K
+            input_file.write(f'{self.M}\t{self.N}\t{self.L}\t{self.K}\n')
+            # write task ID, true label and number of workers for each task, followed by worker ID and corresponding
+            # label
+            _write_rows(input_file, [task_ids, true_labels, np.diff(offsets)], offsets.tolist(), worker_ids, labels)
+
+    def _write_golden(self, golden_ids, golden_labels, worker_ids, offsets, task_ids, labels):
+        with open(os.sep.join([self.output, 'golden.txt']), 'w') as golden_file:
+            golden_file.write(f'{self.golden_num}\n')
+            # write the true label of each golden task
+            golden_file.write(''.join(_join_pairs(golden_ids, golden_labels)) + '\n')
+            # write the label of each worker on each golden task
+            _write_rows(golden_file, [worker_ids], offsets.tolist(), task_ids, labels)
+
+    def _write_attack(self, run, task_ids, labels, offsets, worker_ids):
+        # attack.txt contains the labels randomized by each attacker and the malicious workers controlled by each
+        # attacker
+        attack_file_path = os.sep.join([self.output, str(run), "attack.txt"])
+        task_ids = [f'{task_id}\t' for task_id in task_ids.tolist()]
+        with open(attack_file_path, 'w') as attack_file:
+            attack_file.write(f'{self.mu}\t{self.epsilon}\t{self.lamb}\n')
+            for i in range(0, self.lamb):
+                # write attacker ID and total number of tasks for each attacker, followed by task ID and randomized
+                # label for normal tasks and golden tasks
+                attack_file.write(f'{i}\t{len(task_ids)}\t')
+                attack_file.write(''.join(map(str.__add__, task_ids, [f'{label}\t' for label in labels[i].tolist()])))
+                attack_file.write('\n')
+                # write attacker ID and number of malicious workers for each attacker, followed by worker ID of replaced
+                # independent workers
+                attack_file.write(f'{i}\t{offsets[i + 1] - offsets[i]}\t')
+                attack_file.write(''.join(f'{worker_id}\t' for worker_id in worker_ids[offsets[i]:offsets[i + 1]]))
+                attack_file.write('\n')
+
+    def _write_order(self, run, order):
+        order_file_path = os.sep.join([self.output, str(run), "order.txt"])
+        with open(order_file_path, 'w') as order_file:
+            for start in range(0, len(order), _WRITE_ROWS):
+                order_file.write(''.join(f'{worker}\n' for worker in order[start:start + _WRITE_ROWS].tolist()))
+
     def _file_path(self, file_name):
         return os.sep.join([self.dataset, file_name])
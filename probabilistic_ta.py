@@ -1,46 +1,171 @@
 
 #Provides the component of task assignment based on the truth inference and worker scores, which assigns a task when a worker requests.
+#Normal tasks are indexed in a fixed order: each independent worker walks a queue of the tasks it labeled in the original
+#data, and malicious workers walk the pool of all normal tasks, so that a request is served in amortized O(1).
+#Golden tasks are indexed by their registration order. Each task counts its assigned workers whose reliability score is
+#below delta as they are assigned, removed or rescored, and the golden tasks below capacity are kept in a sorted list,
+#so that a golden task is selected without recounting the workers of every golden task.
 
+from bisect import bisect_left
 from random import Random
 
 
 class ProbabilisticTA:
 
-    def __init__(self, tau, delta, alpha, K):
+    def __init__(self, tau, delta, alpha, K, rand=None):
         self.tau = tau  # trust score threshold for banning workers
         self.delta = delta  # reliability threshold for marking reliable workers
         self.alpha = alpha  # probability to assign a golden task to a new worker
         self.K = K  # number of workers per task
+        self.rand = rand if rand is not None else Random()  # random stream of golden task assignment
+        self.normal_tasks = []  # normal tasks in assignment order
+        self.rank = {}  # position of each normal task in the assignment order
+        self.queues = {}  # normal tasks of each independent worker in assignment order
+        self.cursors = {}  # position of each worker in its queue
+        self.capacity = None  # capacity of golden tasks reserved for other shards (see sharding), if any
+        self.golden_seq = {}  # registration sequence number of each golden task
+        self.seq_golden = {}  # golden task of each registration sequence number
+        self.open_golden = []  # sorted sequence numbers of the golden tasks below capacity
+        self.next_seq = 0  # sequence number of the next registered golden task
 
-    def assign(self, worker, golden_tasks, normal_tasks):
+    def set_normal_tasks(self, normal_tasks):
+        """ index the normal tasks in a fixed assignment order """
+        self.normal_tasks = list(normal_tasks)
+        self.rank = {}
+        for task in self.normal_tasks:
+            self.rank[task] = len(self.rank)
+        self.queues = {}
+        self.cursors = {}
+
+    def set_golden_tasks(self, golden_tasks):
+        """ index the golden tasks in registration order """
+        self.golden_seq = {}
+        self.seq_golden = {}
+        self.open_golden = []
+        for task in golden_tasks:
+            self.add_golden(task)
+
+    def add_golden(self, task, replaced=None):
+        """ register a golden task after the others, in place of the task it replaced, if any """
+        if replaced is not None:
+            self.remove_golden(replaced)
+        seq = self.next_seq
+        self.next_seq += 1
+        self.golden_seq[task] = seq
+        self.seq_golden[seq] = task
+        self._update(task)
+
+    def remove_golden(self, task):
+        """ unregister a golden task """
+        seq = self.golden_seq.pop(task, None)
+        if seq is not None:
+            del self.seq_golden[seq]
+            i = bisect_left(self.open_golden, seq)
+            if i < len(self.open_golden) and self.open_golden[i] == seq:
+                del self.open_golden[i]
+
+    def refresh(self):
+        """ re-evaluate the capacity of every golden task after its counters were replaced """
+        for task in self.golden_seq:
+            self._update(task)
+
+    def assigned(self, task, worker):
+        """ count a worker assigned to a task """
+        if worker.core.r[worker.index] < self.delta:
+            task.add_unreliable(1)
+            self._update(task)
+
+    def removed(self, task, worker):
+        """ discount a worker removed from a task """
+        if worker.core.r[worker.index] < self.delta:
+            task.add_unreliable(-1)
+        self._update(task)
+
+    def rescored(self, worker, r):
+        """ recount the tasks of a worker whose reliability score is about to change to r """
+        unreliable = r < self.delta
+        if (worker.get_r() < self.delta) != unreliable:
+            step = 1 if unreliable else -1
+            for task in worker.get_labeled_pairs().keys():
+                task.add_unreliable(step)
+                self._update(task)
+
+    def _update(self, task):
+        """ keep a golden task in the open golden tasks while it is below capacity """
+        seq = self.golden_seq.get(task)
+        if seq is None:
+            return
+        open_golden = self.open_golden
+        i = bisect_left(open_golden, seq)
+        present = i < len(open_golden) and open_golden[i] == seq
+        if task.get_expose() + task.get_unreliable() < self.K:
+            if not present:
+                open_golden.insert(i, seq)
+        elif present:
+            del open_golden[i]
+
+    def _select_golden(self, worker):
+        """ return the first registered golden task below capacity that the worker can label, or None """
+        labeled = worker.get_labeled_pairs()
+        malicious = worker.get_attacker_id() != -1
+        pairs = worker.get_pairs()
+        capacity = self.capacity
+        if malicious or len(pairs) >= len(self.open_golden):
+            # walk the open golden tasks in registration order
+            for seq in self.open_golden:
+                task = self.seq_golden[seq]
+                if task in labeled or not (malicious or task in pairs):
+                    continue
+                if capacity is None or task.get_expose() + task.get_unreliable() + capacity.count(task) < self.K:
+                    return task
+            return None
+
+        # the first of the golden tasks labeled by the worker in the original data
+        selected = None
+        selected_seq = None
+        for task in pairs:
+            seq = self.golden_seq.get(task)
+            if seq is None or (selected_seq is not None and seq > selected_seq) or task in labeled:
+                continue
+            load = task.get_expose() + task.get_unreliable()
+            if capacity is not None:
+                load += capacity.count(task)
+            if load < self.K:
+                selected = task
+                selected_seq = seq
+        return selected
+
+    def assign(self, worker):
         """ Assign a task to a requesting worker based on the worker's trust score and reliability
         score """
         if worker.get_s() < self.tau and worker.get_r() < self.delta:
             g = self.alpha * (1 - worker.get_r()) + (1 - self.alpha) * worker.get_s()
-            rand = Random()
-            if rand.random() <= g:
-                avail_tasks = set(golden_tasks)
-                avail_tasks.difference_update(worker.get_labeled_pairs().keys())
-                for task in avail_tasks:
-                    if (worker.get_attacker_id() != -1) or (task in worker.get_pairs().keys()):
-                        count = task.get_expose()
-                        for curr_worker in task.get_assigned():
-                            if curr_worker.get_r() < self.delta:
-                                count += 1
-                        if count < self.K:
-                            task.assign(worker)
-                            return task
-
-        # assign a normal task
-        for task in normal_tasks:
-            assigned_workers = task.get_assigned()
-            if worker not in assigned_workers:
-                if worker.get_attacker_id() != -1:
+            if self.rand.random() <= g:
+                task = self._select_golden(worker)
+                if task is not None:
                     task.assign(worker)
+                    self.assigned(task, worker)
                     return task
-                else:
-                    if worker in task.get_workers():
-                        task.assign(worker)
-                        return task
+
+        # assign the first normal task in the worker's queue that has not been assigned to the worker
+        if worker.get_attacker_id() != -1:
+            queue = self.normal_tasks
+        else:
+            queue = self.queues.get(worker)
+            if queue is None:
+                queue = [task for task in worker.get_pairs().keys() if task in self.rank]
+                queue.sort(key=self.rank.get)
+                self.queues[worker] = queue
+        # every task assigned to the worker is labeled right away, so labeled tasks leave the queue for good
+        labeled = worker.get_labeled_pairs()
+        cursor = self.cursors.get(worker, 0)
+        while cursor < len(queue) and queue[cursor] in labeled:
+            cursor += 1
+        self.cursors[worker] = cursor
+        if cursor < len(queue):
+            task = queue[cursor]
+            task.assign(worker)
+            self.assigned(task, worker)
+            return task
 
         return None
@@ -0,0 +1,33 @@
+"""
+#Derives the random streams of the pipeline from one seed. Each stream is identified by a key made of the component and
+#the run (and attacker) it serves, so a stream does not depend on how many other streams are drawn or on the process
+#that draws it, and parallel runs are reproducible. Without a seed every stream is seeded from fresh entropy.
+"""
+from random import Random
+
+import numpy as np
+
+# components drawing random numbers
+SIMULATE = 0  # synthetic tasks, workers and labels
+GOLDEN = 1  # generated golden tasks and worker labels on them
+RUN = 2  # malicious workers, randomized labels and request order of a run
+ATTACK = 3  # honest labels of an attacker on identified golden tasks
+ASSIGN = 4  # golden task assignment
+DEVIATE = 5  # deviations of malicious workers from the sharing
+
+
+def seed_sequence(seed, *key):
+    """ return the seed sequence of the stream identified by the key """
+    if seed is None:
+        return np.random.SeedSequence()
+    return np.random.SeedSequence(seed, spawn_key=key)
+
+
+def generator(seed, *key):
+    """ return the NumPy generator of the stream identified by the key """
+    return np.random.default_rng(seed_sequence(seed, *key))
+
+
+def stream(seed, *key):
+    """ return the Python random stream identified by the key, for drawing single numbers in a loop """
+    return Random(int.from_bytes(seed_sequence(seed, *key).generate_state(4).tobytes(), 'little'))
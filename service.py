@@ -0,0 +1,420 @@
+"""
+#Online engine of TDADP serving live worker activity on the tasks, workers and golden tasks of a Tdadp.
+#The synchronous core assigns a task to a requesting worker, scores a submitted label and runs truth inference with task
+#promotion once B completed tasks can be promoted; Tdadp.run replays a requesting order through it with the inference
+#inline. The asyncio interface exposes request/submit coroutines for live traffic, where truth inference runs in a
+#background executor on a snapshot of the labels, so that assignment is not blocked, and the aggregated labels are
+#published to subscribers as they change.
+"""
+import asyncio
+import math
+import time
+
+import seeding
+from extended_td import ExtendedTD
+from probabilistic_ta import ProbabilisticTA
+from vectorized_td import VectorizedTD
+
+# time (s) spent in each phase of a profiled run, followed by its counters
+PROFILE_STATS = ('assign_time', 'golden_time', 'ban_time', 'normal_time', 'batch_time', 'final_time',
+                 'requests', 'banned_requests', 'idle_requests', 'golden_assignments', 'normal_assignments', 'bans',
+                 'promotions', 'batches', 'etd_calls', 'etd_iterations', 'etd_max_iterations', 'etd_truncated',
+                 'etd_cycles', 'evaluated_tasks')
+
+
+class _SnapshotTask:
+    """ copy of the inputs and output of truth inference on a task """
+
+    __slots__ = ('task', 'aggregated', 'ci', 'assigned')
+
+    def __init__(self, task):
+        self.task = task
+        self.aggregated = task.get_aggregated()
+        self.ci = task.get_ci()
+        self.assigned = []
+
+    def get_aggregated(self):
+        return self.aggregated
+
+    def set_aggregated(self, aggregated):
+        self.aggregated = aggregated
+
+    def get_ci(self):
+        return self.ci
+
+    def get_assigned(self):
+        return self.assigned
+
+
+class _SnapshotWorker:
+    """ copy of the inputs and output of truth inference on a worker """
+
+    __slots__ = ('worker', 's', 'p', 'weight', 'labeled_pairs')
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.s = worker.get_s()
+        self.p = worker.get_p()
+        self.weight = worker.get_weight()
+        self.labeled_pairs = {}
+
+    def get_s(self):
+        return self.s
+
+    def get_p(self):
+        return self.p
+
+    def get_weight(self):
+        return self.weight
+
+    def set_weight(self, w):
+        self.weight = w
+
+    def get_labeled_pairs(self):
+        return self.labeled_pairs
+
+
+class TdadpService:
+
+    def __init__(self, tdadp, background=False, executor=None, rand=None):
+        self.tdadp = tdadp
+        self.background = background  # indicates whether batch truth inference runs in the executor
+        self.executor = executor  # executor of background truth inference (the default executor of the loop if None)
+        self.workers = set()  # current workers in U
+        self.promotion_num = 0  # number of completed tasks that can be promoted
+        self.gold_num = 0  # number of golden task assignment
+        self.pending = {}  # task assigned to each worker and not labeled yet
+        self.log = None  # (worker, task, label) of each submitted label, recorded if set to a list
+        # truth inference
+        if tdadp.vectorized:
+            self.etd = VectorizedTD(tdadp.L, tdadp.incremental, **tdadp.convergence)
+        else:
+            self.etd = ExtendedTD(tdadp.L, tdadp.incremental, **tdadp.convergence)
+        if rand is None:
+            rand = seeding.stream(tdadp.seed, seeding.ASSIGN, tdadp.r)
+        self.pta = ProbabilisticTA(tdadp.tau, tdadp.delta, tdadp.alpha, tdadp.K, rand)  #Task assignment
+        self.pta.set_normal_tasks(tdadp.id_to_task.values())
+        self.pta.set_golden_tasks(tdadp.golden_tasks)
+        self.profile = tdadp.profile
+        self.stats = dict.fromkeys(PROFILE_STATS, 0)  # time (s) and counters of the phases
+
+        # background truth inference
+        self.inference = None  # running background inference
+        self.rerun = False  # indicates whether the batch condition was met again during the running inference
+        self.marked_tasks = set()  # tasks whose labels changed since the snapshot of the running inference
+        self.marked_workers = set()  # workers whose labels or scores changed since the snapshot
+        self.subscribers = []  # queues receiving the (task ID, aggregated label) changes
+        self.published = {}  # last published aggregated label of each task
+        self.unreached = set()  # weighted workers left out of the snapshot of the running inference
+
+    # synchronous core
+
+    def assign(self, worker):
+        """ assign a task to a requesting worker and return it, or None if the worker is banned or has no task """
+        stats = self.stats
+        # case 1: a worker requests
+        if self.profile:
+            stats['requests'] += 1
+        if worker.is_banned():
+            if self.profile:
+                stats['banned_requests'] += 1
+            return None
+        self.workers.add(worker)
+        clock = time.perf_counter() if self.profile else 0
+        task = self.pta.assign(worker)
+        if self.profile:
+            self._lap('assign_time', clock)
+            if not task:
+                stats['idle_requests'] += 1
+        return task
+
+    def label(self, worker, task, label):
+        """
+        record the label of a worker on its assigned task, update the scores of the worker and ban it if needed, and
+        return whether the batch condition is met
+        """
+        tdadp = self.tdadp
+        stats = self.stats
+        clock = time.perf_counter() if self.profile else 0
+        if self.log is not None:
+            self.log.append((worker, task, label))
+        # case 2: a worker labels a golden task
+        if task.is_golden():
+            self.gold_num += 1
+            majority = list(task.get_majority())
+            worker.label(task, label)
+            # the trust score of the worker changes the weight of its votes
+            self._mark_worker(worker)
+
+            # update s_j, r_j and p_j
+            tdadp.score_golden_label(worker, task, majority)
+            s_count = worker.get_s_count()
+            r_count = worker.get_r_count()
+            r_correct = worker.get_r_correct()
+            worker.set_s((2.0 / (1 + math.pow(math.e, -s_count))) - 1)
+
+            # "worker.setR((2.0/(1+Math.pow(Math.E, -r_count/3))-1)*r_correct/r_count);
+            r = (2.0 / (1 + math.pow(math.e, -r_count // 3)) - 1) * r_correct // r_count
+            self.pta.rescored(worker, r)
+            worker.set_r(r)
+            # "worker.setP(r_correct/r_count);
+            worker.set_p(r_correct // r_count)
+
+            if self.profile:
+                stats['golden_assignments'] += 1
+                clock = self._lap('golden_time', clock)
+
+            # ban the worker if trust score passes the threshold
+            if worker.get_s() >= tdadp.tau:
+                self.ban(worker)
+                if self.profile:
+                    stats['bans'] += 1
+                    self._lap('ban_time', clock)
+
+        # case 3: a worker labels a normal task
+        else:
+            worker.label(task, label)
+            self._mark_task(task)
+            self._mark_worker(worker)
+
+            # update the number of completed tasks that can be promoted
+            if len(task.get_assigned()) >= tdadp.K:
+                task.calc_ci()
+                if task.get_ci() >= tdadp.delta:
+                    self.promotion_num += 1
+            if self.profile:
+                stats['normal_assignments'] += 1
+                self._lap('normal_time', clock)
+
+        # check the batch condition
+        if self.promotion_num == tdadp.B:
+            self.promotion_num = 0
+            return True
+        return False
+
+    def ban(self, worker):
+        """ ban a worker and remove its labels on normal tasks """
+        worker.ban()
+        self.workers.discard(worker)
+        to_remove = [task for task in worker.get_labeled_pairs().keys() if not task.is_golden()]
+        for task in to_remove:
+            task.expose()
+            worker.remove(task)
+            task.remove(worker)
+            self.pta.removed(task, worker)
+            self._mark_task(task)
+        self._mark_worker(worker)
+
+    def record(self, worker, task, label):
+        """ record a label that a worker submitted elsewhere, without scoring it """
+        task.assign(worker)
+        self.pta.assigned(task, worker)
+        worker.label(task, label)
+        self._mark_task(task)
+        self._mark_worker(worker)
+
+    def promote(self, task):
+        """ promote a completed normal task to a golden task """
+        self.pta.add_golden(task, self.tdadp.add_golden(task))
+
+    def infer(self):
+        """ update the aggregated labels and promote tasks """
+        clock = time.perf_counter() if self.profile else 0
+        # run truth inference
+        self._hand_over()
+        self.etd.process(self.tdadp.open_tasks, self.workers)
+        self._promote(clock)
+
+    def finish(self):
+        """ run the final truth inference on all normal tasks """
+        clock = time.perf_counter() if self.profile else 0
+        tasks = set(self.tdadp.id_to_task.values())
+        self._hand_over()
+        self.etd.process(tasks, self.workers)
+        if self.profile:
+            self._count_inference()
+            self._lap('final_time', clock)
+        self._publish(tasks)
+
+    # asyncio interface
+
+    async def request(self, worker_id):
+        """ return the ID of the task assigned to a requesting worker, or None """
+        worker = self.tdadp.id_to_worker[worker_id]
+        # a worker that has not labeled its assigned task keeps it
+        task = self.pending.get(worker)
+        if task is None:
+            task = self.assign(worker)
+            if task is None:
+                return None
+            self.pending[worker] = task
+        return task.get_task_id()
+
+    async def submit(self, worker_id, task_id, label):
+        """ record the label of a worker on the task assigned to it """
+        worker = self.tdadp.id_to_worker[worker_id]
+        task = self.pending.get(worker)
+        if task is None or task.get_task_id() != task_id:
+            raise ValueError(f'task {task_id} is not assigned to worker {worker_id}')
+        del self.pending[worker]
+        if self.label(worker, task, label):
+            if self.background:
+                self._schedule()
+            else:
+                self.infer()
+
+    def subscribe(self):
+        """ return a queue receiving the (task ID, aggregated label) pairs of the tasks whose aggregated label changes """
+        queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return queue
+
+    async def drain(self):
+        """ wait until no background truth inference is running """
+        while self.inference is not None:
+            await self.inference
+
+    async def close(self):
+        """ wait for the background truth inference and run the final one """
+        await self.drain()
+        self.finish()
+
+    # helpers
+
+    def _mark_task(self, task):
+        if self.background:
+            self.marked_tasks.add(task)
+        else:
+            self.etd.mark_task(task)
+
+    def _mark_worker(self, worker):
+        if self.background:
+            self.marked_workers.add(worker)
+        else:
+            self.etd.mark_worker(worker)
+
+    def _hand_over(self):
+        """ hand the tasks and workers marked since the last background truth inference over to the inference """
+        for task in self.marked_tasks:
+            self.etd.mark_task(task)
+        for worker in self.marked_workers:
+            self.etd.mark_worker(worker)
+        self.marked_tasks = set()
+        self.marked_workers = set()
+
+    def _promote(self, clock):
+        """ promote the completed open tasks whose assigned workers are reliable enough """
+        tdadp = self.tdadp
+        if self.profile:
+            self._count_inference()
+        promoted = []
+        for task in tdadp.open_tasks:
+            if len(task.get_assigned()) >= tdadp.K:
+                task.calc_ci()
+                if task.get_ci() >= tdadp.delta:
+                    promoted.append(task)
+        # publish the labels inferred for the tasks before they leave the open tasks
+        self._publish(tdadp.open_tasks)
+        for task in promoted:
+            self.promote(task)
+        if self.profile:
+            self.stats['batches'] += 1
+            self.stats['promotions'] += len(promoted)
+            self._lap('batch_time', clock)
+
+    def _schedule(self):
+        """ start a background truth inference, or run another one after the running inference """
+        if self.inference is not None:
+            self.rerun = True
+            return
+        self.inference = asyncio.get_running_loop().create_task(self._infer_background())
+
+    async def _infer_background(self):
+        try:
+            while True:
+                clock = time.perf_counter() if self.profile else 0
+                tasks, workers = self._snapshot()
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.etd.process, tasks, workers)
+                self._apply(tasks, workers)
+                self._promote(clock)
+                if not self.rerun:
+                    break
+                self.rerun = False
+        finally:
+            self.inference = None
+
+    def _snapshot(self):
+        """
+        copy the open tasks, the current workers and every task and worker they reach, and hand the marked tasks and
+        workers over to the inference
+        """
+        open_tasks = self.tdadp.open_tasks
+        snapshot_tasks = {}
+        for task in open_tasks:
+            snapshot_tasks[task] = _SnapshotTask(task)
+        for worker in self.workers:
+            for task in worker.get_labeled_pairs().keys():
+                if task not in snapshot_tasks:
+                    snapshot_tasks[task] = _SnapshotTask(task)
+        snapshot_workers = {}
+        for task, snapshot_task in snapshot_tasks.items():
+            for worker in task.get_assigned():
+                snapshot_worker = snapshot_workers.get(worker)
+                if snapshot_worker is None:
+                    snapshot_worker = snapshot_workers[worker] = _SnapshotWorker(worker)
+                snapshot_task.assigned.append(snapshot_worker)
+                snapshot_worker.labeled_pairs[snapshot_task] = worker.get_labeled_pairs()[task]
+        for worker in self.workers:
+            if worker not in snapshot_workers:
+                snapshot_workers[worker] = _SnapshotWorker(worker)
+
+        etd = self.etd
+        self.unreached = {worker for worker in etd.weighted if worker not in snapshot_workers}
+        etd.weighted = {snapshot_workers[worker] for worker in etd.weighted if worker in snapshot_workers}
+        etd.dirty_tasks = {snapshot_tasks[task] for task in self.marked_tasks if task in snapshot_tasks}
+        etd.dirty_workers = {snapshot_workers[worker] for worker in self.marked_workers if worker in snapshot_workers}
+        self.marked_tasks = set()
+        self.marked_workers = set()
+        return ({snapshot_tasks[task] for task in open_tasks},
+                {snapshot_workers[worker] for worker in self.workers})
+
+    def _apply(self, tasks, workers):
+        """ write the aggregated labels and weights inferred on a snapshot back to the tasks and workers """
+        for snapshot_task in tasks:
+            snapshot_task.task.set_aggregated(snapshot_task.aggregated)
+        for snapshot_worker in workers:
+            # a worker banned during the inference keeps its weight
+            if snapshot_worker.worker in self.workers:
+                snapshot_worker.worker.set_weight(snapshot_worker.weight)
+        self.etd.weighted = {snapshot_worker.worker for snapshot_worker in self.etd.weighted}
+        self.etd.weighted.update(self.unreached)
+        self.unreached = set()
+
+    def _publish(self, tasks):
+        """ send the changed aggregated labels of the tasks to the subscribers """
+        if not self.subscribers:
+            return
+        for task in tasks:
+            aggregated = task.get_aggregated()
+            if aggregated != -1 and self.published.get(task) != aggregated:
+                self.published[task] = aggregated
+                for queue in self.subscribers:
+                    queue.put_nowait((task.get_task_id(), aggregated))
+
+    def _lap(self, timer, clock):
+        """ add the time since the clock to a timer and return the current clock """
+        now = time.perf_counter()
+        self.stats[timer] += now - clock
+        return now
+
+    def _count_inference(self):
+        """ count the iterations, early exits and re-evaluated tasks of the last truth inference call """
+        stats = self.stats
+        etd = self.etd
+        reason = etd.get_stats()['reason']
+        stats['etd_calls'] += 1
+        stats['etd_truncated'] += reason == 'max_iterations'
+        stats['etd_cycles'] += reason == 'cycle'
+        stats['etd_iterations'] += etd.get_iterations()
+        stats['etd_max_iterations'] = max(stats['etd_max_iterations'], etd.get_iterations())
+        stats['evaluated_tasks'] += etd.get_evaluated()
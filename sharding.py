@@ -0,0 +1,282 @@
+"""
+#Sharded mode of TDADP. Workers are hash-partitioned across shards, and each shard serves the task assignment and golden
+#scoring of its workers on its own replica of the run, in a forked process. At each merge the remaining capacity of every
+#golden task is split into fixed quotas of the shards, so that no shard fills a golden task past its capacity between
+#merges and the capacity decisions do not depend on how the shards interleave. Every sync_interval
+#requests the coordinator merges the labels, bans, score counters and attacker observations of the shards into the
+#global state, runs truth inference with task promotion on it, and sends the merged state back to the shards.
+#Shards run in the coordinator process, one after another, where processes cannot be forked.
+"""
+import copy
+import multiprocessing
+import traceback
+from array import array
+
+import numpy as np
+
+import seeding
+from core import STATE
+from service import PROFILE_STATS, TdadpService
+
+_COUNTS = ('s_count', 'r_count', 'r_correct')  # golden task counters, merged by adding the changes of the shards
+_SCORES = ('s', 'r', 'p')  # scores, merged from the shard of each worker
+
+
+def shard_of(worker_ids, shards):
+    """ return the shard of each worker ID by multiplicative hashing """
+    ids = np.asarray(worker_ids, dtype=np.uint64)
+    return ((ids * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)) % np.uint64(shards)
+
+
+def _view(values):
+    """ return a NumPy view of a storage array """
+    return np.frombuffer(values, dtype=values.typecode if isinstance(values, array) else np.uint8)
+
+
+class CapacityQuota:
+    """ share of the remaining capacity of each golden task given to a shard until the next merge """
+
+    def __init__(self, index, shards):
+        self.index = index
+        self.shards = shards
+        self.reserved = {}  # capacity of each golden task reserved for the other shards
+
+    def count(self, task):
+        """ return the capacity of a task reserved for the other shards """
+        return self.reserved.get(task, 0)
+
+    def split(self, tasks, K):
+        """ split the remaining capacity of the golden tasks between the shards """
+        self.reserved = {}
+        for task in tasks:
+            remaining = K - task.get_expose() - task.get_unreliable()
+            if remaining <= 0:
+                continue
+            # the units left over by an even split go to the shards in an order rotated by the task
+            share = remaining // self.shards + int((task.index + self.index) % self.shards < remaining % self.shards)
+            self.reserved[task] = remaining - share
+
+
+class _Shard:
+    """ replica of a run serving the requests of the workers in a partition """
+
+    def __init__(self, tdadp, index, shards):
+        self.tdadp = tdadp
+        self.index = index
+        self.capacity = CapacityQuota(index, shards)
+        self.engine = TdadpService(tdadp, rand=seeding.stream(tdadp.seed, seeding.ASSIGN, tdadp.r, index))
+        self.engine.pta.capacity = self.capacity
+        self.capacity.split(tdadp.golden_tasks, tdadp.K)
+        self.engine.log = []
+        self.rand = seeding.stream(tdadp.seed, seeding.DEVIATE, tdadp.r, index)  # deviations of malicious workers
+        # positions and worker IDs of the requests of the partition
+        order = np.asarray(tdadp.order)
+        self.positions = np.flatnonzero(shard_of(order, shards) == index)
+        self.worker_ids = order[self.positions]
+        self.owned = _owned(tdadp, shards)[index]
+
+    def run_window(self, start, end):
+        """ serve the requests of the partition between two positions of the order and return the changes """
+        tdadp = self.tdadp
+        core = tdadp.core
+        engine = self.engine
+        counts = {name: _view(getattr(core, name)).copy() for name in _COUNTS}
+        banned = _view(core.banned).copy()
+        observed = {attacker_id: dict(attacker.task_count) for attacker_id, attacker in tdadp.id_to_attacker.items()}
+
+        lo, hi = np.searchsorted(self.positions, (start, end))
+        for worker_id in self.worker_ids[lo:hi].tolist():
+            # the batch condition is left to the coordinator
+            tdadp.respond(engine, tdadp.id_to_worker[worker_id], self.rand)
+
+        changes = {}
+        for attacker_id, attacker in tdadp.id_to_attacker.items():
+            before = observed[attacker_id]
+            changes[attacker_id] = [(task.index, count - before.get(task, 0))
+                                    for task, count in attacker.task_count.items() if count != before.get(task, 0)]
+        delta = {
+            'labels': [(worker.index, task.index, label) for worker, task, label in engine.log],
+            'workers': [worker.index for worker in engine.workers],
+            'bans': np.flatnonzero(_view(core.banned) != banned).tolist(),
+            'counts': {name: _view(getattr(core, name)) - counts[name] for name in _COUNTS},
+            'scores': {name: _view(getattr(core, name))[self.owned] for name in _SCORES},
+            'observed': changes,
+            'gold_num': engine.gold_num,
+            'stats': dict(engine.stats),
+        }
+        engine.log = []
+        return delta
+
+    def sync(self, update):
+        """ replace the state of the replica with the merged state """
+        tdadp = self.tdadp
+        core = tdadp.core
+        engine = self.engine
+        for shard, labels in enumerate(update['labels']):
+            if shard != self.index:
+                for worker_index, task_index, label in labels:
+                    engine.record(core.workers[worker_index], core.tasks[task_index], label)
+        for worker_index in update['bans']:
+            worker = core.workers[worker_index]
+            if not worker.is_banned():
+                engine.ban(worker)
+        for task_index in update['promoted']:
+            engine.promote(core.tasks[task_index])
+        # the merged storage arrays overwrite those of the replica
+        for name in STATE:
+            getattr(core, name)[:] = update['arrays'][name]
+        engine.pta.refresh()
+        for attacker_id, changes in update['observed'].items():
+            attacker = tdadp.id_to_attacker[attacker_id]
+            for task_index, count, label in changes:
+                task = core.tasks[task_index]
+                attacker.set_count(task, count)
+                attacker.set_task_label(task, label)
+        self.capacity.split(tdadp.golden_tasks, tdadp.K)
+
+
+def _owned(tdadp, shards):
+    """ return the indexes of the workers in each partition """
+    indexes = np.array([worker.index for worker in tdadp.id_to_worker.values()], dtype=np.int64)
+    partition = shard_of(list(tdadp.id_to_worker.keys()), shards)
+    return [indexes[partition == shard] for shard in range(0, shards)]
+
+
+def _serve(tdadp, index, shards, conn):
+    """ serve the windows and merges sent by the coordinator in a shard process """
+    try:
+        shard = _Shard(tdadp, index, shards)
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if message[0] == 'window':
+                conn.send(shard.run_window(message[1], message[2]))
+            else:
+                shard.sync(message[1])
+    except Exception as e:
+        print(e)
+        traceback.print_stack()
+        traceback.print_exc()
+    finally:
+        conn.close()
+
+
+def _merge(tdadp, engine, deltas, owned):
+    """ merge the changes of the shards into the global state, run truth inference and return the merged state """
+    core = tdadp.core
+    workers = core.workers
+    tasks = core.tasks
+    observed = {}
+    for shard, delta in enumerate(deltas):
+        for worker_index, task_index, label in delta['labels']:
+            engine.record(workers[worker_index], tasks[task_index], label)
+        for worker_index in delta['workers']:
+            engine.workers.add(workers[worker_index])
+        for name in _COUNTS:
+            _view(getattr(core, name))[:] += delta['counts'][name]
+        # workers whose reliability score crossed delta change the counters of their tasks
+        r = _view(core.r)[owned[shard]]
+        scored = delta['scores']['r']
+        for i in np.flatnonzero((r < tdadp.delta) != (scored < tdadp.delta)).tolist():
+            engine.pta.rescored(workers[owned[shard][i]], float(scored[i]))
+        for name in _SCORES:
+            _view(getattr(core, name))[owned[shard]] = delta['scores'][name]
+        for worker_index in delta['bans']:
+            engine.ban(workers[worker_index])
+        for attacker_id, changes in delta['observed'].items():
+            attacker = tdadp.id_to_attacker[attacker_id]
+            for task_index, count in changes:
+                total = attacker.add_count(tasks[task_index], count)
+                if total - count <= tdadp.K < total:
+                    tdadp.identify(attacker_id, tasks[task_index])
+                observed.setdefault(attacker_id, set()).add(task_index)
+
+    golden = set(tdadp.golden_tasks)
+    engine.infer()
+    update = {
+        'labels': [delta['labels'] for delta in deltas],
+        'bans': [worker_index for delta in deltas for worker_index in delta['bans']],
+        'promoted': [task.index for task in tdadp.golden_tasks if task not in golden],
+        'arrays': {name: getattr(core, name) for name in STATE},
+        'observed': {},
+    }
+    for attacker_id, task_indexes in observed.items():
+        attacker = tdadp.id_to_attacker[attacker_id]
+        update['observed'][attacker_id] = [(task_index, attacker.get_count(tasks[task_index]),
+                                            attacker.get_task_label(tasks[task_index])) for task_index in task_indexes]
+    return update
+
+
+def run_sharded(tdadp):
+    """ replay the requesting order of the run on hash-partitioned shards and return the engine of the coordinator """
+    shards = tdadp.shards
+    forked = 'fork' in multiprocessing.get_all_start_methods() and not multiprocessing.current_process().daemon
+    context = multiprocessing.get_context('fork' if forked else None)
+    owned = _owned(tdadp, shards)
+
+    replicas = []
+    processes = []
+    conns = []
+    if forked:
+        # each shard process starts from a copy-on-write replica of the run
+        for index in range(0, shards):
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=_serve, args=(tdadp, index, shards, child_conn))
+            process.start()
+            child_conn.close()
+            processes.append(process)
+            conns.append(conn)
+    else:
+        for index in range(0, shards):
+            replica = copy.deepcopy(tdadp, {id(tdadp.order): tdadp.order})
+            replicas.append(_Shard(replica, index, shards))
+
+    engine = TdadpService(tdadp)
+    deltas = []
+    stopped = False
+    try:
+        interval = max(1, tdadp.sync_interval)
+        for start in range(0, len(tdadp.order), interval):
+            end = start + interval
+            if forked:
+                for conn in conns:
+                    conn.send(('window', start, end))
+                deltas = []
+                for index, conn in enumerate(conns):
+                    try:
+                        deltas.append(conn.recv())
+                    except EOFError:
+                        raise RuntimeError(f'shard {index} stopped')
+            else:
+                deltas = [replica.run_window(start, end) for replica in replicas]
+            tdadp.requests = min(end, len(tdadp.order))
+            update = _merge(tdadp, engine, deltas, owned)
+            if forked:
+                for conn in conns:
+                    conn.send(('sync', update))
+            else:
+                for replica in replicas:
+                    replica.sync(update)
+        for conn in conns:
+            conn.send(None)
+        stopped = True
+    finally:
+        for conn in conns:
+            conn.close()
+        for process in processes:
+            # shards left waiting by a failed merge are stopped
+            if not stopped:
+                process.terminate()
+            process.join()
+
+    engine.finish()
+    # the requests are counted by the shards and the truth inference by the coordinator
+    for delta in deltas:
+        engine.gold_num += delta['gold_num']
+        for name in PROFILE_STATS:
+            if name == 'etd_max_iterations':
+                engine.stats[name] = max(engine.stats[name], delta['stats'][name])
+            else:
+                engine.stats[name] += delta['stats'][name]
+    return engine
@@ -0,0 +1,158 @@
+"""
+#Parameter sweep of TDADP over grids of B, alpha, tau and delta on a preprocessed dataset.
+#The dataset is parsed once and every (configuration, run) job is executed in a freshly forked process. Finished jobs are
+#appended with their seed to a "sweep_checkpoint.txt" file, so that an interrupted sweep with the same seed resumes
+#without recomputing them, and the statistics of each configuration are saved in a "sweep.txt" file. The checkpoint
+#starts with a fingerprint of the dataset files, and the checkpoint of other dataset files is discarded.
+"""
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import traceback
+
+import dataset_cache
+import experiment
+
+# dataset handle shared with the forked job processes
+_shared = {}
+
+
+def _parse_grid(grid, cast):
+    """ parse a comma separated grid of parameter values """
+    return [cast(value) for value in grid.split(',') if value]
+
+
+def _config_key(config, seed=None):
+    """ return the key of a (B, alpha, tau, delta) configuration run with a seed in the checkpoint """
+    return '\t'.join(str(value) for value in config) + f'\t{seed}'
+
+
+def _read_checkpoint(file_path, fingerprint):
+    """ read the results of finished (configuration, run) jobs, or return None if they are of other dataset files """
+    finished = {}
+    if os.path.exists(file_path):
+        with open(file_path) as file:
+            if file.readline().rstrip('\n') != f'#{fingerprint}':
+                return None
+            line = file.readline()
+            while line:
+                elements = line.rstrip('\n').split('\t')
+                # skip a line that was cut off by an interruption
+                if len(elements) == 10:
+                    key = '\t'.join(elements[0:5])
+                    result = (float(elements[6]), float(elements[7]), float(elements[8]), float(elements[9]))
+                    finished[(key, int(elements[5]))] = result
+                line = file.readline()
+    return finished
+
+
+def _run_job(job):
+    """ execute a (configuration, run) job on the shared dataset """
+    config, r = job
+    data = _shared['dataset']
+    data.set_params(*config, seed=_shared['seed'])
+    return job, data.run(r)[0:4]
+
+
+def _run_jobs(data, seed, jobs, processes):
+    """ yield each finished job with its result """
+    _shared['dataset'] = data
+    _shared['seed'] = seed
+    try:
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            # each run starts from the state of the dataset before any run, so the jobs can share it serially
+            for job in jobs:
+                yield _run_job(job)
+            return
+
+        context = multiprocessing.get_context('fork')
+        with context.Pool(max(1, processes), maxtasksperchild=1) as pool:
+            for finished in pool.imap_unordered(_run_job, jobs):
+                yield finished
+    finally:
+        _shared.clear()
+
+
+def _mean_and_error(values):
+    """ return the average and the standard error of the values """
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return mean, 0
+    error = 0
+    for value in values:
+        error += math.pow(mean - value, 2)
+    return mean, math.sqrt(error / (len(values) - 1)) / math.sqrt(len(values))
+
+
+# noinspection PyPep8Naming
+def sweep(dataset, run_num, B_grid, alpha_grid, tau_grid, delta_grid, processes=1, seed=None):
+    """ run TDADP for every configuration in the grids and save the statistics of each configuration """
+    configs = list(itertools.product(B_grid, alpha_grid, tau_grid, delta_grid))
+    checkpoint_path = os.sep.join([dataset, 'sweep_checkpoint.txt'])
+    fingerprint = dataset_cache.fingerprint(dataset, run_num)
+    finished = _read_checkpoint(checkpoint_path, fingerprint)
+    if finished is None:
+        print('The checkpoint was written for other dataset files and is discarded')
+        os.remove(checkpoint_path)
+        finished = {}
+    jobs = [(config, r) for config in configs for r in range(0, run_num)
+            if (_config_key(config, seed), r) not in finished]
+    print(f'{len(configs) * run_num - len(jobs)} of {len(configs) * run_num} jobs already finished')
+
+    if jobs:
+        data = experiment.load_dataset(dataset, run_num)
+        new = not os.path.exists(checkpoint_path)
+        with open(checkpoint_path, 'a') as checkpoint_file:
+            if new:
+                checkpoint_file.write(f'#{fingerprint}\n')
+            for (config, r), result in _run_jobs(data, seed, jobs, processes):
+                finished[(_config_key(config, seed), r)] = result
+                checkpoint_file.write(f'{_config_key(config, seed)}\t{r}\t'
+                                      + '\t'.join(str(value) for value in result) + '\n')
+                checkpoint_file.flush()
+                print(f'B:{config[0]}  alpha:{config[1]}  tau:{config[2]}  delta:{config[3]}  Run {(r + 1)} --- '
+                      f'A-Accuracy:{result[0]}   T-Cost:{result[2]}  Time:{result[3]}ms')
+
+    with open(os.sep.join([dataset, 'sweep.txt']), 'w') as file:
+        file.write('B\talpha\ttau\tdelta\tA-Accuracy\tStandard Error\tE-Number\tStandard Error\tT-cost\tStandard Error'
+                   '\tTime(ms)\tStandard Error\n')
+        for config in configs:
+            results = [finished[(_config_key(config, seed), r)] for r in range(0, run_num)]
+            row = ['\t'.join(str(value) for value in config)]
+            for i in range(0, 4):
+                mean, error = _mean_and_error([result[i] for result in results])
+                row.append(f'{mean}\t{error}')
+            file.write('\t'.join(row) + '\n')
+
+
+# noinspection PyPep8Naming
+def main(args):
+    # "--processes=N" executes the jobs in N parallel processes and "--seed=S" makes the runs reproducible
+    processes = 1
+    seed = None
+    options = [arg for arg in args if arg.startswith('--')]
+    for option in options:
+        if option.startswith('--processes='):
+            processes = int(option.split('=')[1])
+        elif option.startswith('--seed='):
+            seed = int(option.split('=')[1])
+    args = [arg for arg in args if arg not in options]
+
+    if len(args) != 6:
+        print("Usage: sweep.py dataset run_num B_grid alpha_grid tau_grid delta_grid [--processes=N] [--seed=S]")
+        print("where each grid is a comma separated list of values")
+        sys.exit(0)
+
+    try:
+        sweep(args[0], int(args[1]), _parse_grid(args[2], int), _parse_grid(args[3], float),
+              _parse_grid(args[4], float), _parse_grid(args[5], float), processes, seed)
+    except Exception as e:
+        print(e)
+        traceback.print_stack()
+        traceback.print_exc()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
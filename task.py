@@ -1,33 +1,40 @@
 #Modeling of tasks.
 #Each task is associated with an average reliability of workers on the task and a true label. A task is completed once the
 #aggregated answers are determined.
+#The state of a task is stored in the typed arrays of a Core, and the task is a view over its index.
+
+from core import default_core
 
 
 class Task:
 
+    __slots__ = ('core', 'index', 'assigned')
+
     # noinspection PyPep8Naming
-    def __init__(self, task_id, true_label, L):
-        self.workers = []  # assigned workers in the original data
+    def __init__(self, task_id, true_label, L, core=None):
+        self.core = core if core is not None else default_core  # storage of the task state
+        self.index = self.core.add_task(self, task_id, true_label, L)  # index of the task in the storage
         self.assigned = []  # current assigned workers
-        self.true_label = true_label  # true label of the task
-        self.aggregated = -1  # aggregated label of the task
-        self.majority = [0] * L  # majority indicator (1 means that the corresponding label is a majority vote)
-        self.L = L  # label size
-        self.task_id = task_id  # task ID
-        self.c_i = 0  # average reliability score of assigned workers
-        self.exposed = 0  # number of times assigned to banned workers
 
     def get_task_id(self):
         """ return task ID """
-        return self.task_id
+        return self.core.task_id[self.index]
 
     def add_worker(self, worker):
         """ update the original assigned workers for the task """
-        self.workers.append(worker)
+        self.core.add_member(self.index, worker.index)
+
+    def set_golden(self, golden):
+        """ mark the task as a golden task or not """
+        self.core.golden[self.index] = 1 if golden else 0
+
+    def is_golden(self):
+        """ check whether the task is a golden task """
+        return self.core.golden[self.index] == 1
 
     def get_workers(self):
         """ return the original assigned workers for the task """
-        return self.workers
+        return self.core.members(self.index)
 
     def assign(self, worker):
         """" assign a worker to the task """
@@ -43,58 +50,79 @@ class Task:
 
     def get_true_label(self):
         """ return the true label """
-        return self.true_label
+        return self.core.true_label[self.index]
 
     def set_aggregated(self, aggregated):
         """ set the aggregated label """
-        self.aggregated = aggregated
+        self.core.aggregated[self.index] = aggregated
 
     def get_aggregated(self):
         """ return the aggregated label """
-        return self.aggregated
+        return self.core.aggregated[self.index]
+
+    def add_vote(self, label):
+        """ count the label of an assigned worker """
+        self.core.votes[self.index * self.core.L + label] += 1
+
+    def remove_vote(self, label):
+        """ discount the label of a removed worker """
+        self.core.votes[self.index * self.core.L + label] -= 1
+
+    def get_votes(self):
+        """ return the number of assigned workers voting for each label """
+        start = self.index * self.core.L
+        return self.core.votes[start:start + self.core.L].tolist()
 
     def cal_majority(self):
         """ compute the indicator of majority labels that receive the most votes """
-        max_vote = 0
-        for i in range(0, self.L):
-            self.majority[i] = 0
-        for worker in self.assigned:
-            answer = worker.get_labeled_pairs().get(self)
-            self.majority[answer] = self.majority[answer] + 1
-            if self.majority[answer] > max_vote:
-                max_vote = self.majority[answer]
-        for j in range(0, self.L):
-            if self.majority[j] == max_vote and max_vote >= 2:
-                self.majority[j] = 1
-            else:
-                self.majority[j] = 0
+        votes = self.get_votes()
+        max_vote = max(votes)
+        majority = [0] * len(votes)
+        for j in range(0, len(votes)):
+            if votes[j] == max_vote and max_vote >= 2:
+                majority[j] = 1
+        return majority
 
     def get_majority(self):
         """ return the indicator of majority labels that receive the most votes """
-        return self.majority
+        return self.cal_majority()
 
     def expose(self):
         """ update the number of times being assigned to banned workers """
-        self.exposed += + 1
+        self.core.exposed[self.index] += 1
 
     def get_expose(self):
         """ return the number of times being assigned to banned workers """
-        return self.exposed
+        return self.core.exposed[self.index]
+
+    def add_unreliable(self, count):
+        """ update the number of assigned workers whose reliability score is below delta """
+        self.core.unreliable[self.index] += count
+
+    def get_unreliable(self):
+        """ return the number of assigned workers whose reliability score is below delta """
+        return self.core.unreliable[self.index]
 
     def calc_ci(self):
         """ compute the average reliability of assigned workers """
-        self.c_i = 0
+        r = self.core.r
+        c_i = 0
         for worker in self.assigned:
-            self.c_i += worker.get_r()
-        self.c_i = self.c_i / len(self.assigned)
+            c_i += r[worker.index]
+        self.core.c_i[self.index] = c_i / len(self.assigned)
 
     def get_ci(self):
         """ return the average reliability of assigned workers """
-        return self.c_i
+        return self.core.c_i[self.index]
 
     def reset(self):
         """ reset the features of the task for a new run """
+        core = self.core
+        i = self.index
         self.assigned = []
-        self.aggregated = -1
-        self.c_i = 0
-        self.exposed = 0
+        for j in range(i * core.L, (i + 1) * core.L):
+            core.votes[j] = 0
+        core.aggregated[i] = -1
+        core.c_i[i] = 0
+        core.exposed[i] = 0
+        core.unreliable[i] = 0
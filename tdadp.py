@@ -2,15 +2,19 @@
 #Main framework that coordinates task assignment and truth inference to deal with different worker activities for defending against data poisoning attack.
 #The statistics about Accuracy, Cost, Completion and running time are saved in a "result.txt" file.
 """
-import math
 import os
 import datetime
-import random
 import traceback
 
+import numpy as np
+
+import binary_dataset
+import checkpoint
+import seeding
+import sharding
 from attacker import Attacker
-from extended_td import ExtendedTD
-from probabilistic_ta import ProbabilisticTA
+from core import Core
+from service import TdadpService
 from task import Task
 from worker import Worker
 
@@ -19,15 +23,26 @@ from worker import Worker
 class Tdadp:
 
     # noinspection PyPep8Naming
-    def __init__(self, B, alpha, tau, delta):
+    def __init__(self, B, alpha, tau, delta, vectorized=False, incremental=False, seed=None, profile=False,
+                 convergence=None, shards=1, sync_interval=1000, checkpoint_dir=None, checkpoint_interval=10000):
         # TDADP parameters
         self.B = B  # condition for terminating a batch
         self.alpha = alpha  # probability to assign a golden task to a new worker
         self.tau = tau  #Trust score threshold 
         self.delta = delta  # reliability threshold for marking reliable workers
+        self.vectorized = vectorized  # indicates whether truth inference runs on the NumPy backend
+        self.incremental = incremental  # indicates whether batch truth inference only revisits changed tasks
+        self.seed = seed  # seed of the random streams of each run, or None for fresh entropy
+        self.r = 0  # index of the run whose attack has been read
+        self.profile = profile  # indicates whether each run records the time and counters of its phases
+        self.convergence = convergence or {}  # convergence criteria of truth inference (see ExtendedTD)
+        self.shards = shards  # number of worker partitions served in parallel (see sharding)
+        self.sync_interval = sync_interval  # number of requests between the merges of the shards
+        self.checkpoint_dir = checkpoint_dir  # directory of the snapshots of each run, or None (see checkpoint)
+        self.checkpoint_interval = checkpoint_interval  # number of requests between the snapshots of a run
 
         # dataset parameters
-        self.order = []  # requesting order of workers;
+        self.order = []  # requesting order of worker IDs, memory-mapped from order.npy if available
         self.L = 0  # label size
         self.K = 0  # number of workers per task
 
@@ -35,22 +50,43 @@ class Tdadp:
         self.epsilon = 0
         self.lambd = 0
 
+        # storage of the worker and task state
+        self.core = Core()
+
         # ID mapping
         self.id_to_task = {}  # ID to normal task mapping
         self.id_to_worker = {}  # ID to worker mapping
-        self.id_to_golden = {}  # ID to golden task mapping
+        self.id_to_golden = {}  # ID to golden task mapping, including the tasks promoted in the current run
+        self.base_golden = {}  # ID to golden task mapping parsed from golden.txt
+        self.golden_dataset = None  # dataset whose golden tasks have been parsed
         self.id_to_attacker = {}  # ID to attacker mapping
 
+        # task registry, kept in dicts ordered by registration so that every run visits tasks in a reproducible order
+        self.golden_tasks = {}  # golden tasks, including promoted normal tasks
+        self.open_tasks = {}  # normal tasks that have not been promoted
+
         # evaluation parameters
         self.a_accuracy = 0  # aggregation accuracy
-        self.e_number = 0  # average number of exposed golden tasks
+        self.e_number = 0  # number of exposed golden tasks, kept up to date during a run
         self.t_cost = 0  # average number of golden task assignment for testing each worker
-        self.running_time = 0  # running time of TDADP in millisecond      
+        self.running_time = 0  # running time of TDADP in millisecond
+        self.elapsed = 0  # running time (ms) of the current run before it resumed from a snapshot
+        self.profile_stats = {}  # time (s) and counters of the phases of the last profiled run
+
+        # exposure tracking, updated when an attacker observes a task and when a task is promoted
+        self.requests = 0  # number of requests served in the current run
+        self.identified = {}  # attackers that observed each task more than K times
+        self.exposed = {}  # golden tasks identified by an attacker, in the order of their exposure
+        self.attacker_exposed = {}  # number of exposed golden tasks identified by each attacker
+        self.exposure = []  # (requests served, E-Number) whenever the number of exposed golden tasks changes
            
     def read_normal(self, dataset):
         """ read worker labels on normal tasks """
         try:
             file_path = os.sep.join([dataset, 'input.txt'])
+            if binary_dataset.prefer_binary(file_path, os.sep.join([dataset, 'input.npz'])):
+                self._read_normal_binary(dataset)
+                return
             with open(file_path) as file:
                 line = file.readline()
                 elements = line.split('\t')
@@ -62,13 +98,14 @@ class Tdadp:
                     task_id = int(elements[0])
                     true_label = int(elements[1])
                     worker_num = int(elements[2])
-                    task = Task(task_id, true_label, self.L)
+                    task = Task(task_id, true_label, self.L, self.core)
                     self.id_to_task[task_id] = task
+                    self.open_tasks[task] = None
                     for i in range(0, worker_num):
                         worker_id = int(elements[2 * i + 3])
                         answer = int(elements[2 * i + 4])
                         if worker_id not in self.id_to_worker.keys():
-                            worker = Worker()
+                            worker = Worker(self.core)
                             self.id_to_worker[worker_id] = worker
                             worker.add_pair(task, answer)
                             task.add_worker(worker)
@@ -83,196 +120,194 @@ class Tdadp:
             traceback.print_exc()
 
     def read_golden(self, dataset):
+        """ read worker labels on golden tasks, or restore the parsed golden tasks for a new run """
         try:
-            """ read worker labels on golden tasks """
-            file_path = os.sep.join([dataset, 'golden.txt'])
-            with open(file_path) as file:
-                line = file.readline()
-                golden_num = int(line)
-                line = file.readline()
-                elements = line.split('\t')
-                for i in range(0, golden_num):
-                    golden_id = int(elements[i * 2])
-                    task = Task(golden_id, int(elements[i * 2 + 1]), self.L)
-                    self.id_to_golden[golden_id] = task
-                line = file.readline()
-                while line:
-                    elements = line.split('\t')
-                    worker_id = int(elements[0])
-                    worker = self.id_to_worker[worker_id]
-                    for j in range(0, golden_num):
-                        golden_id = int(elements[j * 2 + 1])
-                        task = self.id_to_golden[golden_id]
-                        answer = int(elements[j * 2 + 2])
-                        worker.add_pair(task, answer)
-                    line = file.readline()
+            # golden tasks are parsed once per dataset
+            if self.golden_dataset != dataset:
+                self.base_golden = {}
+                self._reset_golden()
+                file_path = os.sep.join([dataset, 'golden.txt'])
+                if binary_dataset.prefer_binary(file_path, os.sep.join([dataset, 'golden.npz'])):
+                    self._read_golden_binary(dataset)
+                else:
+                    self._read_golden_text(file_path)
+                self.base_golden = dict(self.id_to_golden)
+                self.golden_dataset = dataset
+            self._reset_golden()
         except Exception as e:
             print(e)
             traceback.print_stack()
             traceback.print_exc()
 
+    def _read_golden_text(self, file_path):
+        """ read worker labels on golden tasks from golden.txt """
+        with open(file_path) as file:
+            line = file.readline()
+            golden_num = int(line)
+            line = file.readline()
+            elements = line.split('\t')
+            for i in range(0, golden_num):
+                golden_id = int(elements[i * 2])
+                task = Task(golden_id, int(elements[i * 2 + 1]), self.L, self.core)
+                self.add_golden(task)
+            line = file.readline()
+            while line:
+                elements = line.split('\t')
+                worker_id = int(elements[0])
+                worker = self.id_to_worker[worker_id]
+                for j in range(0, golden_num):
+                    golden_id = int(elements[j * 2 + 1])
+                    task = self.id_to_golden[golden_id]
+                    answer = int(elements[j * 2 + 2])
+                    worker.add_pair(task, answer)
+                line = file.readline()
+
     def read_attack(self, dataset, r):
         """ read malicious workers of each attacker for the rth run """
         try:
-            self.id_to_attacker = {}
-            file_path = os.sep.join([dataset, str(r), 'attack.txt'])
-            with open(file_path) as file:
-                line = file.readline()
-                elements = line.split('\t')
-                self.epsilon = float(elements[1])
-                self.lambd = int(elements[2])
-                for i in range(0, self.lambd):
-                    line = file.readline()
-                    elements = line.split('\t')
-                    attacker_id = int(elements[0])
-                    task_num = int(elements[1])
-                    attacker = Attacker(self.K, self.L)
-                    self.id_to_attacker[attacker_id] = attacker
-                    for j in range(0, task_num):
-                        task_id = int(elements[2 * j + 2])
-                        label = int(elements[2 * j + 3])
-                        if task_id in self.id_to_task.keys():
-                            attacker.set_task_label(self.id_to_task[task_id], label)
-                        else:
-                            attacker.set_task_label(self.id_to_golden[task_id], label)
-                    line = file.readline()
-                    elements = line.split('\t')
-                    attacker_id = int(elements[0])
-                    worker_num = int(elements[1])
-                    for j in range(0, worker_num):
-                        worker_id = int(elements[j + 2])
-                        worker = self.id_to_worker[worker_id]
-                        worker.set_attacker_id(attacker_id)
+            self.set_attack(r, self.parse_attack(dataset, r))
         except Exception as e:
             print(e)
             traceback.print_stack()
             traceback.print_exc()
 
+    def parse_attack(self, dataset, r):
+        """
+        return the probability of deviating from the sharing, and the tasks, randomized labels and malicious worker IDs
+        of each attacker for the rth run
+        """
+        file_path = os.sep.join([dataset, str(r), 'attack.txt'])
+        if binary_dataset.prefer_binary(file_path, os.sep.join([dataset, str(r), 'attack.npz'])):
+            return self._parse_attack_binary(dataset, r)
+        attackers = {}
+        with open(file_path) as file:
+            line = file.readline()
+            elements = line.split('\t')
+            epsilon = float(elements[1])
+            lambd = int(elements[2])
+            for i in range(0, lambd):
+                line = file.readline()
+                elements = line.split('\t')
+                attacker_id = int(elements[0])
+                task_num = int(elements[1])
+                tasks = [self._attack_task(int(elements[2 * j + 2])) for j in range(0, task_num)]
+                labels = [int(elements[2 * j + 3]) for j in range(0, task_num)]
+                line = file.readline()
+                elements = line.split('\t')
+                worker_num = int(elements[1])
+                attackers[attacker_id] = (tasks, labels, [int(elements[j + 2]) for j in range(0, worker_num)])
+        return epsilon, attackers
+
+    def set_attack(self, r, attack):
+        """ set up the attackers of the rth run from the attack returned by parse_attack """
+        epsilon, attackers = attack
+        self.id_to_attacker = {}
+        self.r = r
+        self.epsilon = epsilon
+        self.lambd = len(attackers)
+        for attacker_id, (tasks, labels, worker_ids) in attackers.items():
+            attacker = Attacker(self.K, self.L, seeding.stream(self.seed, seeding.ATTACK, r, attacker_id))
+            self.id_to_attacker[attacker_id] = attacker
+            for task, label in zip(tasks, labels):
+                attacker.set_task_label(task, label)
+            for worker_id in worker_ids:
+                self.id_to_worker[worker_id].set_attacker_id(attacker_id)
+
     def read_order(self, dataset, r):
         """ read requesting order of workers for the rth run """
         try:
             self.order = []
             file_path = os.sep.join([dataset, str(r), 'order.txt'])
-            with open(file_path) as file:
-                line = file.readline()
-                while line:
-                    worker_id = int(line)
-                    self.order.append(self.id_to_worker[worker_id])
-                    line = file.readline()
+            if binary_dataset.prefer_binary(file_path, os.sep.join([dataset, str(r), 'order.npy'])):
+                self.order = binary_dataset.load_order(dataset, r)
+                return
+            # parsed by NumPy without building a string per request
+            self.order = np.fromfile(file_path, dtype=np.int32, sep=' ')
         except Exception as e:
             print(e)
             traceback.print_stack()
             traceback.print_exc()
 
-    def run(self):
-        workers = set()  # current workers in U
-        promotion_num = 0  # number of completed tasks that can be promoted
-        gold_num = 0  # number of golden task assignment
-        etd = ExtendedTD(self.L)  # truth inference
-        pta = ProbabilisticTA(self.tau, self.delta, self.alpha, self.K)  #Task assignment
+    def _read_normal_binary(self, dataset):
+        """ read worker labels on normal tasks from input.npz """
+        data = binary_dataset.load_normal(dataset)
+        self.L = int(data['shape'][2])
+        self.K = int(data['shape'][3])
+        task_ids = data['task_ids'].tolist()
+        true_labels = data['true_labels'].tolist()
+        offsets = data['offsets'].tolist()
+        worker_ids = data['worker_ids'].tolist()
+        labels = data['labels'].tolist()
+        for i in range(0, len(task_ids)):
+            task = Task(task_ids[i], true_labels[i], self.L, self.core)
+            self.id_to_task[task_ids[i]] = task
+            self.open_tasks[task] = None
+            for j in range(offsets[i], offsets[i + 1]):
+                worker = self.id_to_worker.get(worker_ids[j])
+                if worker is None:
+                    worker = Worker(self.core)
+                    self.id_to_worker[worker_ids[j]] = worker
+                worker.add_pair(task, labels[j])
+                task.add_worker(worker)
 
-        start_time = datetime.datetime.now().timestamp()
-        # respond to different worker activity
-        for worker in self.order:
-            # case 1: a worker requests
-            if worker.is_banned():
-                continue
-            else:
-                workers.add(worker)
-            golden_tasks = set(self.id_to_golden.values())
-            normal_tasks = set(self.id_to_task.values())
-            assigned_task = pta.assign(worker, golden_tasks, normal_tasks)
-            if assigned_task and worker.get_attacker_id() != -1:
-                attacker = self.id_to_attacker[worker.get_attacker_id()]
-                # update the observation of the attacker if a task is assigned to a malicious worker
-                attacker.observe(assigned_task)
-
-            # case 2: a worker labels a golden task
-            if assigned_task in self.id_to_golden.values():
-                gold_num += 1
-                if worker.get_attacker_id() == -1:
-                    worker.label(assigned_task, worker.get_pairs()[assigned_task])
-                else:
-                    attacker = self.id_to_attacker[worker.get_attacker_id()]
-                    label = attacker.get_task_label(assigned_task)
-                    worker.label(assigned_task, label)
-
-                # update s_j, r_j and p_j
-                s_count = 0
-                r_count = 0
-                r_correct = 0
-                for task in worker.get_labeled_pairs().keys():
-                    if task in self.id_to_golden.values():
-                        r_count += 1
-                        task.cal_majority()
-                        majority = task.get_majority()
-                        truth = task.get_true_label()
-                        if task in self.id_to_task.values():
-                            truth = task.get_aggregated()
-                        answer = worker.get_labeled_pairs()[task]
-                        for i in range(0, self.L):
-                            if majority[i] == 1 and answer == i and i != truth:
-                                s_count += 1
-                        if answer == truth:
-                            r_correct += 1
-                worker.set_s((2.0 / (1 + math.pow(math.e, -s_count))) - 1)
-               
-            # "worker.setR((2.0/(1+Math.pow(Math.E, -r_count/3))-1)*r_correct/r_count);
-                worker.set_r((2.0 / (1 + math.pow(math.e, -r_count // 3)) - 1) * r_correct // r_count)
-                              # "worker.setP(r_correct/r_count);
-                worker.set_p(r_correct // r_count)
-
-                # ban the worker if trust score passes the threshold
-                if worker.get_s() >= self.tau:
-                    worker.ban()
-                    # remove the worker's labels on normal tasks
-                    workers.remove(worker)
-                    to_remove = set(worker.get_labeled_pairs().keys())
-                    to_remove.difference_update(self.id_to_golden.values())
-                    for task in to_remove:
-                        task.expose()
-                        worker.remove(task)
-                        task.remove(worker)
-
-            # case 3: a worker labels a normal task
-            elif assigned_task in self.id_to_task.values():
-                attacker_id = worker.get_attacker_id()
-                if attacker_id != -1:
-                    label = self.id_to_attacker[attacker_id].get_task_label(assigned_task)
-
-                    # occasionally deviate from the sharing
-                    rand = random.Random()
-                    if rand.random() <= self.epsilon:
-                        temp_label = rand.randint(0, self.L - 1)
-                        while temp_label == label:
-                            temp_label = random.randint(0, self.L - 1)
-                        label = temp_label
-                else:
-                    label = worker.get_pairs().get(assigned_task)
-                worker.label(assigned_task, label)
+    def _read_golden_binary(self, dataset):
+        """ read worker labels on golden tasks from golden.npz """
+        data = binary_dataset.load_golden(dataset)
+        golden_ids = data['golden_ids'].tolist()
+        golden_labels = data['golden_labels'].tolist()
+        for i in range(0, len(golden_ids)):
+            self.add_golden(Task(golden_ids[i], golden_labels[i], self.L, self.core))
+        worker_ids = data['worker_ids'].tolist()
+        offsets = data['offsets'].tolist()
+        task_ids = data['task_ids'].tolist()
+        labels = data['labels'].tolist()
+        for i in range(0, len(worker_ids)):
+            worker = self.id_to_worker[worker_ids[i]]
+            for j in range(offsets[i], offsets[i + 1]):
+                worker.add_pair(self.id_to_golden[task_ids[j]], labels[j])
 
-                # update the number of completed tasks that can be promoted
-                if len(assigned_task.get_assigned()) >= self.K:
-                    assigned_task.calc_ci()
-                    if assigned_task.get_ci() >= self.delta:
-                        promotion_num += 1
+    def _parse_attack_binary(self, dataset, r):
+        """ parse the attack of the rth run from attack.npz """
+        data = binary_dataset.load_attack(dataset, r)
+        tasks = [self._attack_task(task_id) for task_id in data['task_ids'].tolist()]
+        offsets = data['offsets'].tolist()
+        worker_ids = data['worker_ids'].tolist()
+        attackers = {}
+        for attacker_id, labels in enumerate(data['labels'].tolist()):
+            attackers[attacker_id] = (tasks, labels, worker_ids[offsets[attacker_id]:offsets[attacker_id + 1]])
+        return float(data['params'][1]), attackers
 
-            # if the batch condition is met, update aggregated labels and promote tasks
-            if promotion_num == self.B:
-                tasks = set(self.id_to_task.values())
-                tasks.difference_update(self.id_to_golden.values())
-                # run truth inference
-                etd.process(tasks, workers)
-                for task in tasks:
-                    if len(task.get_assigned()) >= self.K:
-                        task.calc_ci()
-                        if task.get_ci() >= self.delta:
-                            self.id_to_golden[task.get_task_id()] = task
-                promotion_num = 0
-
-        tasks = set(self.id_to_task.values())
-        etd.process(tasks, workers)
+    def _attack_task(self, task_id):
+        """ return the normal or golden task targeted by an attacker """
+        task = self.id_to_task.get(task_id)
+        return task if task is not None else self.id_to_golden[task_id]
+
+    def run(self):
+        # a run with a snapshot resumes from it, and a finished run restores its results
+        snapshot = None
+        if self.checkpoint_dir is not None and self.shards <= 1:
+            snapshot = checkpoint.load(self._checkpoint_path(), self)
+            if snapshot is not None and snapshot['finished']:
+                checkpoint.restore_results(snapshot, self)
+                # the malicious workers of the run are reset for the next run
+                for worker in self.id_to_worker.values():
+                    worker.reset()
+                return
+
+        self.requests = 0
+        self.identified = {}
+        self.exposed = {}
+        self.attacker_exposed = dict.fromkeys(self.id_to_attacker, 0)
+        self.exposure = []
+        self.e_number = 0
+        self.elapsed = 0
+        start_time = datetime.datetime.now().timestamp()
+        if self.shards > 1:
+            engine = sharding.run_sharded(self)
+        else:
+            engine = self._replay(snapshot, start_time)
         end_time = datetime.datetime.now().timestamp()
+        self.profile_stats = engine.stats if self.profile else {}
 
         self.a_accuracy = 0
         for task in self.id_to_task.values():
@@ -282,23 +317,164 @@ class Tdadp:
         for worker in self.id_to_worker.values():
             worker.reset()
         self.a_accuracy = self.a_accuracy / len(self.id_to_task)
-        exposed = set()
-        for attacker in self.id_to_attacker.values():
-            for golden in self.id_to_golden.values():
-                if attacker.get_count(golden) > self.K:
-                    exposed.add(golden)
-        self.e_number = len(exposed)
-        self.t_cost = gold_num / len(self.id_to_worker)
-        self.running_time = (end_time - start_time) * 1000
+        self.t_cost = engine.gold_num / len(self.id_to_worker)
+        self.running_time = (end_time - start_time) * 1000 + self.elapsed
+        if self.checkpoint_dir is not None and self.shards <= 1:
+            checkpoint.save_results(self._checkpoint_path(), self)
+
+    def _replay(self, snapshot=None, start_time=None):
+        """
+        replay the requesting order of the run through an engine and return it, resuming from a snapshot if given and
+        saving snapshots if a checkpoint directory is set
+        """
+        engine = TdadpService(self)  # task assignment, scoring and truth inference
+        rand = seeding.stream(self.seed, seeding.DEVIATE, self.r)  # deviations of malicious workers
+        if snapshot is not None:
+            self.elapsed = checkpoint.restore(snapshot, self, engine, rand)
+        interval = self.checkpoint_interval if self.checkpoint_dir is not None else 0
+        for worker_id in binary_dataset.stream_order(self.order[self.requests:]):
+            # if the batch condition is met, update aggregated labels and promote tasks
+            if self.respond(engine, self.id_to_worker[worker_id], rand):
+                engine.infer()
+            if interval and self.requests % interval == 0:
+                elapsed = (datetime.datetime.now().timestamp() - start_time) * 1000 + self.elapsed
+                checkpoint.save(self._checkpoint_path(), self, engine, rand, elapsed)
+        engine.finish()
+        return engine
+
+    def _checkpoint_path(self):
+        """ return the snapshot path of the current run """
+        return checkpoint.path(self.checkpoint_dir, self.r)
+
+    def respond(self, engine, worker, rand):
+        """
+        assign a task to a requesting worker, which labels it right away, and return whether the batch condition is
+        met
+        """
+        self.requests += 1
+        assigned_task = engine.assign(worker)
+        if not assigned_task:
+            return False
+        attacker_id = worker.get_attacker_id()
+        if attacker_id != -1:
+            attacker = self.id_to_attacker[attacker_id]
+            # update the observation of the attacker if a task is assigned to a malicious worker
+            if attacker.observe(assigned_task) == self.K + 1:
+                self.identify(attacker_id, assigned_task)
+            label = attacker.get_task_label(assigned_task)
+
+            # occasionally deviate from the sharing on normal tasks
+            if not assigned_task.is_golden() and rand.random() <= self.epsilon:
+                temp_label = rand.randint(0, self.L - 1)
+                while temp_label == label:
+                    temp_label = rand.randint(0, self.L - 1)
+                label = temp_label
+        elif assigned_task.is_golden():
+            label = worker.get_pairs()[assigned_task]
+        else:
+            label = worker.get_pairs().get(assigned_task)
+        return engine.label(worker, assigned_task, label)
+
+    def identify(self, attacker_id, task):
+        """ record that an attacker observed a task more than K times, exposing it if it is a golden task """
+        attackers = self.identified.get(task)
+        if attackers is None:
+            attackers = self.identified[task] = []
+        attackers.append(attacker_id)
+        if self.id_to_golden.get(task.get_task_id()) is task:
+            self._expose(task, (attacker_id,))
+
+    def _expose(self, task, attackers):
+        """ count a golden task identified by the attackers """
+        for attacker_id in attackers:
+            self.attacker_exposed[attacker_id] += 1
+        if task not in self.exposed:
+            self.exposed[task] = None
+            self.e_number = len(self.exposed)
+            self.exposure.append((self.requests, self.e_number))
+
+    def _conceal(self, task):
+        """ stop counting a golden task that is no longer golden """
+        if task in self.exposed:
+            for attacker_id in self.identified[task]:
+                self.attacker_exposed[attacker_id] -= 1
+            del self.exposed[task]
+            self.e_number = len(self.exposed)
+            self.exposure.append((self.requests, self.e_number))
+
+    def _golden_truth(self, task):
+        """ return the label that a golden task is scored against (the aggregated label for promoted tasks) """
+        if self.id_to_task.get(task.get_task_id()) is task:
+            return task.get_aggregated()
+        return task.get_true_label()
+
+    def score_golden_label(self, worker, task, majority):
+        """ update the golden task counters after a worker labeled a golden task with the given previous majority """
+        truth = self._golden_truth(task)
+        new_majority = task.get_majority()
+        # workers who voted for a label that became or stopped being a wrong majority label
+        flipped = [i for i in range(0, self.L) if majority[i] != new_majority[i] and i != truth]
+        if flipped:
+            for curr_worker in task.get_assigned():
+                answer = curr_worker.get_labeled_pairs()[task]
+                if curr_worker is not worker and answer in flipped:
+                    curr_worker.update_counts(new_majority[answer] - majority[answer], 0, 0)
+        answer = worker.get_labeled_pairs()[task]
+        worker.update_counts(int(new_majority[answer] == 1 and answer != truth), 1, int(answer == truth))
+
+    def _reset_golden(self):
+        """ restore the parsed golden tasks and demote the tasks promoted in the previous run """
+        for task in self.golden_tasks:
+            if self.base_golden.get(task.get_task_id()) is not task:
+                task.set_golden(False)
+                if self.id_to_task.get(task.get_task_id()) is task:
+                    self.open_tasks[task] = None
+        self.id_to_golden = dict(self.base_golden)
+        self.golden_tasks = dict.fromkeys(self.base_golden.values())
+        for task in self.golden_tasks:
+            task.reset()
+
+    def add_golden(self, task):
+        """ register a golden task or promote a completed normal task, and return the golden task it replaced """
+        replaced = self.id_to_golden.get(task.get_task_id())
+        if replaced is not None:
+            replaced.set_golden(False)
+            self.golden_tasks.pop(replaced, None)
+            if self.id_to_task.get(replaced.get_task_id()) is replaced:
+                self.open_tasks[replaced] = None
+            self._conceal(replaced)
+        self.id_to_golden[task.get_task_id()] = task
+        self.golden_tasks[task] = None
+        self.open_tasks.pop(task, None)
+        task.set_golden(True)
+        # a task identified by an attacker before its promotion is exposed right away
+        attackers = self.identified.get(task)
+        if attackers is not None:
+            self._expose(task, attackers)
+        # the labels on a promoted task now count towards the scores of its workers
+        truth = self._golden_truth(task)
+        majority = task.get_majority()
+        for worker in task.get_assigned():
+            answer = worker.get_labeled_pairs()[task]
+            worker.update_counts(int(majority[answer] == 1 and answer != truth), 1, int(answer == truth))
+        return replaced
 
     def get_a_accuracy(self):
         """ return the aggregation accuracy """
         return self.a_accuracy
 
     def get_e_number(self):
-        """ return the average number of exposed golden tasks """
+        """ return the number of exposed golden tasks, at any point of a run """
         return self.e_number
 
+    def get_exposure(self):
+        """ return the (requests served, E-Number) pairs recorded whenever the number of exposed golden tasks changed """
+        return list(self.exposure)
+
+    def get_attacker_exposed(self):
+        """ return the number of exposed golden tasks identified by each attacker """
+        return dict(self.attacker_exposed)
+
     def get_t_cost(self):
         """ return the average number of golden task assignment for testing each worker """
         return self.t_cost
@@ -306,3 +482,7 @@ class Tdadp:
     def get_running_time(self):
         """ return the running time """
         return self.running_time
+
+    def get_profile(self):
+        """ return the time (s) and counters of the phases of the last run, or an empty dict if it was not profiled """
+        return dict(self.profile_stats)
@@ -0,0 +1,51 @@
+"""
+#Round trip of a run through a snapshot: a run interrupted after its first snapshot resumes from it with the results of
+#an uninterrupted run, including labels that do not fit in int8.
+"""
+import numpy as np
+import pytest
+
+import checkpoint
+import dataset_cache
+import experiment
+from preprocess import Preprocess
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def test_resume_with_large_label_size(tmp_path, monkeypatch):
+    dataset = str(tmp_path)
+    pre = Preprocess.synth_dataset(dataset, 1, 0.3, 0.1, 3, 300, 60, 200, 8, 0.5, seed=3)
+    dataset_cache.preprocess(pre)
+    expected = experiment.run_experiment(experiment.load_dataset(dataset, 1), 10, 0.5, 0.3, 0.0, seed=7)
+
+    save = checkpoint.save
+
+    def save_and_interrupt(*args):
+        save(*args)
+        raise _Interrupted()
+
+    monkeypatch.setattr(checkpoint, 'save', save_and_interrupt)
+    with pytest.raises(_Interrupted):
+        experiment.run_experiment(experiment.load_dataset(dataset, 1), 10, 0.5, 0.3, 0.0, seed=7,
+                                  checkpoint_dir=dataset, checkpoint_interval=500)
+    monkeypatch.setattr(checkpoint, 'save', save)
+    with np.load(checkpoint.path(dataset, 0)) as snapshot:
+        assert not snapshot['finished'] and int(snapshot['requests']) == 500
+
+    restore = checkpoint.restore
+    restored = []
+
+    def record_restore(*args):
+        restored.append(True)
+        return restore(*args)
+
+    monkeypatch.setattr(checkpoint, 'restore', record_restore)
+    resumed = experiment.run_experiment(experiment.load_dataset(dataset, 1), 10, 0.5, 0.3, 0.0, seed=7,
+                                        checkpoint_dir=dataset, checkpoint_interval=500)
+    assert restored
+    assert resumed.a_accuracy.tolist() == expected.a_accuracy.tolist()
+    assert resumed.e_number.tolist() == expected.e_number.tolist()
+    assert resumed.t_cost.tolist() == expected.t_cost.tolist()
@@ -0,0 +1,142 @@
+#Provides a NumPy backend of the truth inference. The (task, worker, label) triples of the current assignment state are
+#flattened into a sparse incidence once per call, so that each iteration computes the votes and the worker weights with
+#batched array operations instead of walking the assigned workers and labeled pairs in Python. The results are identical
+#to those of ExtendedTD on the same inputs. Incremental calls revisit a small frontier and fall back to ExtendedTD.
+
+import numpy as np
+
+from extended_td import ExtendedTD
+
+
+class VectorizedTD(ExtendedTD):
+
+    # noinspection PyPep8Naming
+    def __init__(self, L, incremental=False, **convergence):
+        super().__init__(L, incremental, **convergence)
+
+    def process(self, tasks, workers):
+        """ iteratively run truth inference and return the statistics of the call """
+        if self.incremental and self.warm:
+            return self._process_frontier(tasks, workers)
+
+        tasks = list(tasks)
+        workers = list(workers)
+        # set the initial weight of workers to their accuracy on golden tasks
+        for worker in workers:
+            worker.set_weight(worker.get_p())
+        if not tasks:
+            return self._finish(0, workers, self._call_stats(0, 0, 0.0, 'converged'))
+
+        # index workers: the updated workers first, followed by any other worker that labeled one of the tasks
+        worker_index = {}
+        for worker in workers:
+            worker_index[worker] = len(worker_index)
+        updated_num = len(worker_index)
+        task_index = {}
+        for task in tasks:
+            task_index[task] = len(task_index)
+        task_num = len(task_index)
+
+        # (task, worker, label) incidence of the votes, in the same order as ExtendedTD sums them
+        vote_task = []
+        vote_worker = []
+        vote_label = []
+        for task in tasks:
+            i = task_index[task]
+            for worker in task.get_assigned():
+                j = worker_index.get(worker)
+                if j is None:
+                    j = len(worker_index)
+                    worker_index[worker] = j
+                vote_task.append(i)
+                vote_worker.append(j)
+                vote_label.append(worker.get_labeled_pairs()[task])
+
+        # (worker, task, label) incidence of the labeled pairs used for weight estimation; tasks that are not inferred
+        # in this call keep their aggregated label
+        pair_worker = []
+        pair_task = []
+        pair_label = []
+        pair_ci = []
+        fixed_aggregated = []
+        for worker in workers:
+            j = worker_index[worker]
+            assigned = worker.get_labeled_pairs()
+            for task in assigned.keys():
+                i = task_index.get(task)
+                if i is None:
+                    i = task_num + len(fixed_aggregated)
+                    task_index[task] = i
+                    fixed_aggregated.append(task.get_aggregated())
+                pair_worker.append(j)
+                pair_task.append(i)
+                pair_label.append(assigned[task])
+                pair_ci.append(task.get_ci())
+
+        s = np.array([worker.get_s() for worker in worker_index], dtype=np.float64)
+        weight = np.array([worker.get_weight() for worker in worker_index], dtype=np.float64)
+        vote_task = np.array(vote_task, dtype=np.int64)
+        vote_worker = np.array(vote_worker, dtype=np.int64)
+        # each vote adds s_j / L and then (1 - s_j) * w_j to its slot, so the slots are repeated to keep the order of
+        # floating point additions
+        vote_slot = np.repeat(vote_task * self.L + np.array(vote_label, dtype=np.int64), 2)
+        vote_s = s[vote_worker]
+        vote_share = vote_s / self.L
+        vote_worker_weight = 1 - vote_s
+        pair_worker = np.array(pair_worker, dtype=np.int64)
+        pair_task = np.array(pair_task, dtype=np.int64)
+        pair_label = np.array(pair_label, dtype=np.int64)
+        pair_ci = np.array(pair_ci, dtype=np.float64)
+        aggregated = np.array([task.get_aggregated() for task in tasks] + fixed_aggregated, dtype=np.int64)
+        estimated = np.zeros(updated_num, dtype=bool)  # whether a worker's weight is re-estimated
+
+        iteration = 0
+        changed = np.zeros(task_num, dtype=bool)  # tasks changed by the previous iteration
+        previous = aggregated[:task_num].copy()  # labels before the previous iteration
+        reason = 'max_iterations'
+        difference = 0
+        weight_delta = 0.0
+        while iteration < self.max_iterations:
+            iteration += 1
+
+            # task aggregation
+            votes = np.zeros(task_num * self.L, dtype=np.float64)
+            np.add.at(votes, vote_slot, np.column_stack((vote_share, vote_worker_weight * weight[vote_worker])).ravel())
+            labels = votes.reshape(task_num, self.L).argmax(axis=1)
+            now_changed = labels != aggregated[:task_num]
+            difference = int(np.count_nonzero(now_changed))
+            cycle = (self.detect_cycles and difference > 0 and np.array_equal(now_changed, changed)
+                     and np.array_equal(labels[now_changed], previous[now_changed]))
+            if self.detect_cycles:
+                changed = now_changed
+                previous = aggregated[:task_num].copy()
+            aggregated[:task_num] = labels
+
+            # terminate if converge
+            reason = self._stop_reason(difference, task_num, cycle)
+            if reason:
+                break
+
+            # weight estimation
+            correct = np.zeros(updated_num, dtype=np.float64)
+            count = np.zeros(updated_num, dtype=np.float64)
+            np.add.at(correct, pair_worker, np.where(pair_label == aggregated[pair_task], pair_ci, 0.0))
+            np.add.at(count, pair_worker, pair_ci)
+            positive = count > 0
+            estimate = correct[positive] / count[positive]
+            weight_delta = float(np.abs(estimate - weight[:updated_num][positive]).max()) if estimate.size else 0.0
+            weight[:updated_num][positive] = estimate
+            estimated |= positive
+            if self.weight_tolerance is not None and weight_delta <= self.weight_tolerance:
+                reason = 'weight_tolerance'
+                break
+        else:
+            reason = 'max_iterations'
+
+        for task in tasks:
+            task.set_aggregated(int(aggregated[task_index[task]]))
+        for worker in workers:
+            j = worker_index[worker]
+            if estimated[j]:
+                worker.set_weight(float(weight[j]))
+        return self._finish(task_num, workers, self._call_stats(iteration, difference, weight_delta, reason))
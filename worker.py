@@ -1,92 +1,118 @@
 # Provides the modeling of workers. Each worker is associated with a trust score, a reliability score and an accuracy on golden tasks.
 # The attacker id indicates which data poisoning attacker controls the worker.
+# The state of a worker is stored in the typed arrays of a Core, and the worker is a view over its index.
+
+from core import Pairs, default_core
 
 
 class Worker:
 
-    def __init__(self):
-        self.pairs = {}  # the (task, label) pairs in the original dataset
+    __slots__ = ('core', 'index', 'labeled_pairs')
+
+    def __init__(self, core=None):
+        self.core = core if core is not None else default_core  # storage of the worker state
+        self.index = self.core.add_worker(self)  # index of the worker in the storage
         self.labeled_pairs = {}  # the (task, label) pairs for tasks currently assigned to the worker
-        self.s_j = 0  # Trust score
-        self.r_j = 0  # reliability score
-        self.p_j = 0  # accuracy on golden tasks
-        self.attacker_id = -1  # indicates which attacker the worker belongs to 
-        self.weight = 0  # weight of the worker's labels in truth inference
-        self.banned = False  # indicates whether the worker is banned
 
     def add_pair(self, task, label):
         """ add a (task, label) pair in the original dataset """
-        self.pairs[task] = label
+        self.core.add_pair(self.index, task.index, label)
 
     def get_pairs(self):
         """ return the (task, label) pairs in the original dataset """
-        return self.pairs
+        return Pairs(self.core, self.index)
 
     def label(self, task, label):
         """ update the current (task, label) pair """
         self.labeled_pairs[task] = label
+        task.add_vote(label)
 
     def get_labeled_pairs(self):
         """ return the current (task, label) pairs """
         return self.labeled_pairs
 
     def remove(self, task):
-       #remove the label of a task labeled by the banned worker 
-        del self.labeled_pairs[task]
+       #remove the label of a task labeled by the banned worker
+        task.remove_vote(self.labeled_pairs.pop(task))
 
     def set_s(self, s):
         # set the trust score
-        self.s_j = s
+        self.core.s[self.index] = s
 
     def get_s(self):
-        # return the trust score 
-        return self.s_j
+        # return the trust score
+        return self.core.s[self.index]
 
     def set_r(self, r):
         """ set the reliability score """
-        self.r_j = r
+        self.core.r[self.index] = r
 
     def get_r(self):
         """ return the reliability score """
-        return self.r_j
+        return self.core.r[self.index]
+
+    def update_counts(self, s_count, r_count, r_correct):
+        """ add to the counters of golden tasks behind the trust score and reliability score """
+        core = self.core
+        core.s_count[self.index] += s_count
+        core.r_count[self.index] += r_count
+        core.r_correct[self.index] += r_correct
+
+    def get_s_count(self):
+        """ return the number of golden tasks on which the worker votes for a wrong majority label """
+        return self.core.s_count[self.index]
+
+    def get_r_count(self):
+        """ return the number of golden tasks labeled by the worker """
+        return self.core.r_count[self.index]
+
+    def get_r_correct(self):
+        """ return the number of golden tasks correctly labeled by the worker """
+        return self.core.r_correct[self.index]
 
     def set_p(self, p):
         """ set the accuracy on golden tasks """
-        self.p_j = p
+        self.core.p[self.index] = p
 
     def get_p(self):
         """ return the accuracy on golden tasks """
-        return self.p_j
+        return self.core.p[self.index]
 
     def set_attacker_id(self, attacker_id):
-       #set the attacker ID (id=-1 means the worker is an independent worker) 
-        self.attacker_id = attacker_id
+       #set the attacker ID (id=-1 means the worker is an independent worker)
+        self.core.attacker_id[self.index] = attacker_id
 
     def get_attacker_id(self):
         """ return the attacker ID """
-        return self.attacker_id
+        return self.core.attacker_id[self.index]
 
     def set_weight(self, w):
         """ update the worker's weight in  truth inference """
-        self.weight = w
+        self.core.weight[self.index] = w
 
     def get_weight(self):
         """ return the worker's weight in truth inference """
-        return self.weight
+        return self.core.weight[self.index]
 
     def ban(self):
         """ ban the worker """
-        self.banned = True
+        self.core.banned[self.index] = 1
 
     def is_banned(self):
         """ check whether the worker is banned """
-        return self.banned
+        return self.core.banned[self.index] == 1
 
     def reset(self):
         """ reset the features of the worker for a new run """
+        core = self.core
+        i = self.index
         self.labeled_pairs = {}
-        self.s_j = 0
-        self.r_j = 0
-        self.attacker_id = -1
-        self.weight = 0.8
-        self.banned = False
+        core.s[i] = 0
+        core.r[i] = 0
+        core.p[i] = 0
+        core.s_count[i] = 0
+        core.r_count[i] = 0
+        core.r_correct[i] = 0
+        core.attacker_id[i] = -1
+        core.weight[i] = 0.8
+        core.banned[i] = 0